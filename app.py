@@ -1,30 +1,123 @@
-from flask import Flask, render_template, request, redirect, session, url_for, jsonify
+from flask import Flask, Response, make_response, render_template, request, redirect, session, stream_template, stream_with_context, url_for, jsonify
+import applog
 import db
+import events
+import fragments
+import google_oauth
+import metrics
+import passwords
+import purge
+import ratelimit
+import sessions
+import storage
 import os
 import json
-import requests
 import hashlib
+import math
+import time
 from dotenv import load_dotenv
 from urllib.parse import urlencode, parse_qs
 from urllib.request import urlopen
+from flask import before_render_template, g, template_rendered
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 load_dotenv()
 
+log = applog.get_logger('app')
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY')
-# Reverse proxy 환경(예: Render, Nginx)에서 https/host 인식 보정
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+# Reverse proxy 환경(예: Render, Nginx)에서 https/host/클라이언트 IP 인식 보정
+# (IP별 속도 제한이 프록시 주소 하나로 묶이지 않도록 X-Forwarded-For도 반영)
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.getenv('PROXY_X_FOR', 1)), x_proto=1, x_host=1)
+# 과부하 시 라우팅/세션/DB 전에 바로 503 (MAX_CONCURRENT_REQUESTS, MAX_QUEUE_MS)
+app.wsgi_app = ratelimit.AdmissionControl(app.wsgi_app)
+
+# 서버 사이드 세션 저장소 (설정하면 쿠키에는 세션 id만 저장, 비우면 서명된 쿠키 세션)
+# 워커가 여럿이면 file:// 또는 sqlite:// 처럼 워커끼리 공유되는 저장소를 쓸 것
+SESSION_STORE_URL = os.getenv('SESSION_STORE_URL')
+if SESSION_STORE_URL:
+    sessions.init_app(app, SESSION_STORE_URL)
+
+# 템플릿 바이트코드 캐시 + 메모 카드 조각 캐시
+fragments.init_app(app)
+
+# 다른 워커에서 발행한 메모 변경 알림 수신 (EVENT_BROKER_URL 설정 시)
+events.start()
 
 # Google OAuth 설정
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 GOOGLE_REDIRECT_URI = os.getenv('GOOGLE_REDIRECT_URI', '').strip()
-GOOGLE_AUTH_URL = 'https://accounts.google.com/o/oauth2/v2/auth'
-GOOGLE_TOKEN_URL = 'https://oauth2.googleapis.com/token'
-GOOGLE_USERINFO_URL = 'https://www.googleapis.com/oauth2/v1/userinfo'
 SCOPES = ['openid', 'email', 'profile']
 
+# /api/memos 페이지 크기
+MEMO_PAGE_SIZE = int(os.getenv('MEMO_PAGE_SIZE', 30))
+MEMO_PAGE_SIZE_MAX = 100
+# /api/memos/changes 한 번에 돌려줄 최대 변경 수
+MEMO_CHANGES_PAGE_MAX = 500
+# 검색어 최대 길이
+SEARCH_QUERY_MAX = 200
+# 내보내기 시 한 번에 읽어올 행 수
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 500))
+# 가져오기 시 INSERT 한 번(트랜잭션 하나)에 넣을 행 수
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))
+# JSON 배열 가져오기 본문 최대 크기(바이트) - 전체를 메모리에서 파싱하므로 제한, 큰 가져오기는 NDJSON
+IMPORT_JSON_MAX_BYTES = int(os.getenv('IMPORT_JSON_MAX_BYTES', 10 * 1024 * 1024))
+# /memos 페이지를 렌더링하면서 바로 흘려보낼지 (0이면 다 만든 뒤 한 번에 응답)
+MEMO_PAGE_STREAM = os.getenv('MEMO_PAGE_STREAM', '1') != '0'
+# 스트리밍 시 이만큼(글자 수) 모아서 한 번에 전송
+STREAM_FLUSH_SIZE = int(os.getenv('STREAM_FLUSH_SIZE', 8192))
+
+# /metrics 접근 토큰 (설정하면 Authorization: Bearer <토큰> 필요)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# 탈퇴 계정 메모를 이 프로세스에서 지울지 (0이면 python purge.py 를 따로 실행)
+if os.getenv('ACCOUNT_PURGE_WORKER', '1') != '0':
+    purge.start_worker()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_db_routing():
+    # 최근에 쓰기를 한 세션은 복제 지연 동안 primary에서 읽음 (read-your-writes)
+    last_write = session.get('db_write_at', 0)
+    db.start_routing(primary=time.time() - last_write < db.READ_YOUR_WRITES_WINDOW)
+
+@app.after_request
+def remember_db_write(response):
+    if db.wrote_to_primary():
+        session['db_write_at'] = time.time()
+    return response
+
+@app.teardown_request
+def finish_db_routing(exc):
+    db.finish_routing()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('memo_http_request_seconds', time.perf_counter() - started,
+                        endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault('template_started', []).append(time.perf_counter())
+
+def _template_finished(sender, template, context, **extra):
+    starts = g.get('template_started')
+    if starts:
+        metrics.observe('memo_template_render_seconds', time.perf_counter() - starts.pop(),
+                        template=template.name or 'string')
+
+before_render_template.connect(_template_started, app)
+template_rendered.connect(_template_finished, app)
+
 def get_google_redirect_uri():
     """환경변수 또는 현재 요청을 기반으로 Redirect URI 결정"""
     if GOOGLE_REDIRECT_URI and GOOGLE_REDIRECT_URI.upper() != 'AUTO':
@@ -32,6 +125,63 @@ def get_google_redirect_uri():
     # 현재 요청 기준으로 자동 생성 (프록시 환경은 ProxyFix로 보정)
     return url_for('auth_google_callback', _external=True)
 
+def current_user_id():
+    """로그인한 사용자의 users.id - 세션에 저장된 id를 그대로 사용 (사용자 조회 없음)
+
+    예전 세션처럼 id가 없을 때만 username으로 한 번 조회해서 세션에 저장
+    탈퇴한 계정은 메모 조회/쓰기 쿼리가 users.deleted_at을 확인하므로 데이터에 접근할 수 없음
+    """
+    if 'username' not in session:
+        return None
+    user_id = session.get('user_id')
+    if user_id is None:
+        user_id = db.get_user_id(session['username'])
+        if user_id is not None:
+            session['user_id'] = user_id
+    return user_id
+
+def account_gone():
+    """메모 쓰기가 실패했을 때 확인 - 계정이 탈퇴 처리됐으면 세션을 비우고 True (실패 경로에서만 조회)"""
+    if db.get_user_id(session.get('username'), fresh=True) is not None:
+        return False
+    session.pop('username', None)
+    session.pop('user_id', None)
+    return True
+
+def rate_limited(rule, *keys):
+    """rule 한도를 넘었으면 다시 시도할 때까지 초(올림), 아니면 0"""
+    return math.ceil(ratelimit.check(rule, *keys))
+
+def too_many_requests(response, retry_after):
+    """429 + Retry-After"""
+    response = make_response(response)
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def memo_list_etag(user_id, seq, *parts):
+    """사용자 변경 순번 + 요청 파라미터로 강한 ETag 생성 (순번이 없으면 None)
+
+    순번은 호출하는 쪽에서 한 번 읽어서 넘김 - 목록 캐시 키와 같은 값을 써야 함
+    """
+    if seq is None:
+        return None
+    raw = ':'.join(str(part) for part in (user_id, seq) + parts)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+def with_etag(response, etag):
+    """응답에 ETag와 재검증 강제 Cache-Control 설정"""
+    if etag:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag):
+    """If-None-Match가 현재 ETag와 같으면 304 응답, 아니면 None"""
+    if etag and request.if_none_match.contains(etag):
+        return with_etag(Response(status=304), etag)
+    return None
+
 @app.route('/', methods=['GET'])
 def home():
     return render_template('index.html')
@@ -41,8 +191,20 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        if db.verify_user(username, password):
+        # 해시 계산 전에 IP와 대상 계정별로 시도 횟수 제한 (무차별 대입/워커 독점 방지)
+        retry_after = rate_limited('login', f'ip:{request.remote_addr}', f'user:{username.lower()}')
+        if retry_after:
+            return too_many_requests(render_template(
+                'login.html', error=f'로그인 시도가 너무 많습니다. {retry_after}초 후 다시 시도하세요.'), retry_after)
+        try:
+            verified = db.verify_user(username, password)
+        except passwords.PasswordHasherBusy:
+            return render_template('login.html', error='요청이 많습니다. 잠시 후 다시 시도하세요.'), 503
+        if verified:
+            sessions.rotate(session)
             session['username'] = username
+            # 방금 인증하면서 캐시된 id라 추가 조회 없음
+            session['user_id'] = db.get_user_id(username)
             return redirect(url_for('home'))
         else:
             return render_template('login.html', error='Invalid username or password')
@@ -54,6 +216,10 @@ def register():
     else:
         username = request.form['username']
         password = request.form['password']
+        retry_after = rate_limited('register', f'ip:{request.remote_addr}')
+        if retry_after:
+            return too_many_requests(render_template(
+                'register.html', error=f'가입 요청이 너무 많습니다. {retry_after}초 후 다시 시도하세요.'), retry_after)
         try:
             db.add_user(username, password)
             return redirect(url_for('login', registered='1'))
@@ -63,6 +229,7 @@ def register():
 def logout():
     if 'username' in session:
         session.pop('username')
+        session.pop('user_id', None)
     else:
         return redirect(url_for('login'), 403)
     return redirect(url_for('home'))
@@ -90,10 +257,10 @@ def auth_google():
         'prompt': 'consent'  # 항상 동의 화면 표시
     }
     
-    authorization_url = f"{GOOGLE_AUTH_URL}?{urlencode(params)}"
-    print(f"[OAuth] Redirecting to: {authorization_url}")
-    print(f"[OAuth] Client ID: {GOOGLE_CLIENT_ID}")
-    print(f"[OAuth] Redirect URI: {redirect_uri}")
+    auth_url = google_oauth.endpoints()['authorization_endpoint']
+    authorization_url = f"{auth_url}?{urlencode(params)}"
+    log.debug("OAuth redirecting to: %s", authorization_url)
+    log.debug("OAuth client ID: %s, redirect URI: %s", GOOGLE_CLIENT_ID, redirect_uri)
     
     return redirect(authorization_url)
 
@@ -118,36 +285,15 @@ def auth_google_callback():
         return render_template('login.html', error='인증 코드가 없습니다.')
     
     try:
-        # 토큰 요청
+        # 토큰 요청 (공용 세션 + 타임아웃), ID 토큰은 캐시된 JWKS로 로컬 검증
         redirect_uri = get_google_redirect_uri()
-        token_params = {
-            'client_id': GOOGLE_CLIENT_ID,
-            'client_secret': GOOGLE_CLIENT_SECRET,
-            'code': code,
-            'grant_type': 'authorization_code',
-            'redirect_uri': redirect_uri
-        }
-        
-        token_response = requests.post(GOOGLE_TOKEN_URL, data=token_params)
-        
-        if token_response.status_code != 200:
-            return render_template('login.html', error='토큰 획득 실패')
-        
-        token_data = token_response.json()
-        access_token = token_data.get('access_token')
-        
-        if not access_token:
-            return render_template('login.html', error='액세스 토큰 없음')
-        
-        # 사용자 정보 요청
-        headers = {'Authorization': f'Bearer {access_token}'}
-        userinfo_response = requests.get(GOOGLE_USERINFO_URL, headers=headers)
-        
-        if userinfo_response.status_code != 200:
-            return render_template('login.html', error='사용자 정보 조회 실패')
-        
-        user_info = userinfo_response.json()
-        
+        try:
+            token_data = google_oauth.exchange_code(
+                code, GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, redirect_uri)
+            user_info = google_oauth.user_from_tokens(token_data, GOOGLE_CLIENT_ID)
+        except google_oauth.OAuthError as e:
+            return render_template('login.html', error=str(e))
+
         google_id = user_info.get('id')
         email = user_info.get('email')
         name = user_info.get('name')
@@ -160,19 +306,22 @@ def auth_google_callback():
         username = f"google_{google_id}"
         password_hash = hashlib.sha256(google_id.encode()).hexdigest()
         
+        user_id = None
         try:
-            # 사용자가 존재하는지 확인
-            if db.verify_user(username, google_id):
-                pass  # 이미 존재
-            else:
+            # Google이 이미 인증했으므로 비밀번호 해시 검증 없이 id만 확인 (탈퇴 여부는 캐시 없이)
+            user_id = db.get_user_id(username, fresh=True)
+            if user_id is None:
                 # 새 사용자 생성
-                db.add_user(username, google_id)
+                user_id = db.add_user(username, google_id)
         except Exception as e:
             # 사용자가 이미 존재할 수 있음
-            print(f"User creation/verification: {e}")
+            log.warning("User creation/verification: %s", e)
+            user_id = db.get_user_id(username)
         
-        # 세션 설정
+        # 세션 설정 (로그인했으니 세션 id 새로 발급)
+        sessions.rotate(session)
         session['username'] = username
+        session['user_id'] = user_id
         session['email'] = email
         session['name'] = name
         session['picture'] = picture
@@ -184,52 +333,335 @@ def auth_google_callback():
         return redirect(url_for('home'))
         
     except Exception as e:
-        print(f"OAuth callback error: {e}")
+        log.exception("OAuth callback error: %s", e)
         return render_template('login.html', error=f'인증 중 오류 발생: {str(e)}')
 
 @app.post('/memo')
 def add_memo():
     if 'username' not in session:
         return redirect(url_for('login'), 403)
+    user_id = current_user_id()
+    if user_id is None:
+        return redirect(url_for('login'), 403)
+    retry_after = rate_limited('memo_write', f'user:{user_id}')
+    if retry_after:
+        return too_many_requests(jsonify({'error': '요청이 너무 많습니다'}), retry_after)
     title = request.form['title']
     content = request.form['content']
-    username = session['username']
-    db.add_memo(title, content, username)
+    try:
+        db.add_memo(title, content, user_id)
+    except db.DBError:
+        if account_gone():
+            return redirect(url_for('login'), 403)
+        raise
     return redirect(url_for('home'))
 
+def memo_summary_json(memo):
+    """(id, title, preview, created_at, content_length) 요약 행을 목록 항목으로 변환"""
+    return {
+        'id': memo[0],
+        'title': memo[1],
+        'preview': memo[2],
+        'length': memo[4],
+        'truncated': storage.preview_truncated(memo[2], memo[4]),
+    }
+
 @app.get('/api/memos')
 def api_get_memos():
     if 'username' not in session:
-        return jsonify([])
-    username = session['username']
-    memos = db.get_memos(username)
-    return jsonify([{
+        return jsonify({'items': [], 'next_cursor': None, 'seq': None})
+    user_id = current_user_id()
+    limit = min(max(request.args.get('limit', MEMO_PAGE_SIZE, type=int), 1), MEMO_PAGE_SIZE_MAX)
+    cursor = request.args.get('cursor') or None
+    # 순번은 한 번만 읽음 - 304면 이 조회 하나로 끝나고, 아니면 같은 순번 키로 목록 캐시 확인
+    # 그 사이 변경은 changes?since=seq 에 포함됨
+    seq = db.get_memo_seq(user_id)
+    cached = not_modified(memo_list_etag(user_id, seq, 'api', limit, cursor))
+    if cached is not None:
+        return cached
+    try:
+        seq, memos = db.get_memo_summary_page(user_id, limit=limit, cursor=cursor, seq=seq)
+    except db.DBError as e:
+        return jsonify({'error': str(e)}), 400
+    # 그 사이 쓰기가 있었으면 목록이 반영한 새 순번으로 seq/ETag를 맞춤
+    # 본문 대신 미리보기만 보냄 - 전체 내용은 /api/memos/<id>
+    return with_etag(jsonify({
+        'items': [memo_summary_json(memo) for memo in memos],
+        'next_cursor': db.next_cursor(memos, limit),
+        'seq': seq,
+    }), memo_list_etag(user_id, seq, 'api', limit, cursor))
+
+@app.get('/api/memos/changes')
+def api_memo_changes():
+    """since 순번 이후의 메모 추가/삭제만 반환 (reset이면 목록 전체를 다시 받아야 함)"""
+    if 'username' not in session:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'since가 필요합니다'}), 400
+    limit = min(max(request.args.get('limit', MEMO_CHANGES_PAGE_MAX, type=int), 1),
+                MEMO_CHANGES_PAGE_MAX)
+    try:
+        result = db.get_memo_changes(current_user_id(), since, limit)
+    except db.DBError as e:
+        return jsonify({'error': str(e)}), 500
+    if result is None:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    changes = []
+    for seq, op, memo_id, *summary in result['changes']:
+        if op == 'd':
+            changes.append({'seq': seq, 'op': 'delete', 'id': memo_id})
+        else:
+            changes.append({'seq': seq, 'op': 'insert', 'id': memo_id,
+                            'memo': memo_summary_json((memo_id, *summary))})
+    response = jsonify({'seq': result['seq'], 'reset': result['reset'],
+                        'more': result['more'], 'changes': changes})
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.get('/api/memos/stream')
+def api_memo_stream():
+    """메모 추가/삭제 알림 (Server-Sent Events)
+
+    알림을 받으면 클라이언트가 /api/memos/changes?since= 로 변경분을 가져감
+    스트림마다 요청 스레드 하나를 점유하므로 스레드가 하나뿐인 sync 워커에서는 열지 않고,
+    여러 스레드여도 다른 요청용 스레드를 남기도록 events.max_streams()개까지만 엶
+    """
+    if 'username' not in session:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    user_id = current_user_id()
+    if user_id is None:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    if not request.environ.get('wsgi.multithread') or events.max_streams() == 0:
+        # 204는 EventSource가 재연결하지 않음 - 클라이언트는 주기적 동기화만 사용
+        return Response(status=204)
+    if not events.acquire_stream():
+        metrics.inc('memo_sse_rejected_total')
+        return Response(status=503, headers={'Retry-After': '60'})
+    # gunicorn --preload 처럼 fork 전에 import된 경우에도 이 워커의 수신 스레드를 띄움
+    events.start()
+    ready = lambda: {'seq': db.get_memo_seq(user_id)}
+    response = Response(events.stream(user_id, ready), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # nginx가 버퍼링하지 않고 바로 내보내도록
+        'X-Accel-Buffering': 'no',
+    })
+    # 본문을 보내기 전에 끊겨도 서버가 응답을 닫으면 자리를 돌려줌
+    response.call_on_close(events.release_stream)
+    return response
+
+@app.get('/api/memos/<int:memo_id>')
+def api_get_memo(memo_id):
+    """메모 하나의 전체 내용"""
+    if 'username' not in session:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    try:
+        memo = db.get_memo(memo_id, current_user_id())
+    except db.DBError as e:
+        return jsonify({'error': str(e)}), 500
+    if memo is None:
+        return jsonify({'error': '메모를 찾을 수 없습니다'}), 404
+    # 메모는 수정되지 않으므로 id + 작성 시각으로 ETag
+    etag = hashlib.sha256(f"memo:{memo[0]}:{memo[3]}".encode()).hexdigest()[:32]
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return with_etag(jsonify({
         'id': memo[0],
         'title': memo[1],
-        'content': memo[2]
-    } for memo in memos])
+        'content': memo[2],
+        'created_at': str(memo[3]),
+    }), etag)
+
+@app.get('/api/memos/search')
+def api_search_memos():
+    """메모 검색 (q=검색어, limit, cursor)"""
+    if 'username' not in session:
+        return jsonify({'items': [], 'next_cursor': None})
+    query = (request.args.get('q') or '').strip()[:SEARCH_QUERY_MAX]
+    limit = min(max(request.args.get('limit', MEMO_PAGE_SIZE, type=int), 1), MEMO_PAGE_SIZE_MAX)
+    cursor = request.args.get('cursor') or None
+    try:
+        rows, next_page = db.search_memos(current_user_id(), query, limit=limit, cursor=cursor)
+    except db.DBError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'items': [{
+            'id': row[0],
+            'title': row[1],
+            'content': row[2],
+            'score': row[3],
+        } for row in rows],
+        'next_cursor': next_page,
+    })
+
+@app.get('/api/memos/export')
+def export_memos():
+    """메모 전체를 스트리밍으로 내보내기 (format=ndjson | json)"""
+    if 'username' not in session:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    user_id = current_user_id()
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        return jsonify({'error': 'format은 ndjson 또는 json 이어야 합니다'}), 400
+
+    def memo_json(memo):
+        return json.dumps({
+            'id': memo[0],
+            'title': memo[1],
+            'content': memo[2],
+            'created_at': str(memo[3]),
+        }, ensure_ascii=False)
+
+    def generate():
+        # chunk 단위로 문자열을 만들어 한 번에 내보냄
+        first = True
+        if fmt == 'json':
+            yield '['
+        for chunk in db.iter_memo_chunks(user_id, EXPORT_CHUNK_SIZE):
+            if fmt == 'ndjson':
+                yield ''.join(memo_json(memo) + '\n' for memo in chunk)
+            else:
+                body = ','.join(memo_json(memo) for memo in chunk)
+                yield body if first else ',' + body
+                first = False
+        if fmt == 'json':
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=memos.{fmt}'},
+    )
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+def import_too_large():
+    return jsonify({'error': f'JSON 배열 가져오기는 {IMPORT_JSON_MAX_BYTES}바이트까지입니다. '
+                             '더 큰 가져오기는 NDJSON(application/x-ndjson)을 사용하세요'}), 413
+
+def iter_import_rows():
+    """요청 본문을 메모 dict로 순서대로 읽기 (NDJSON은 한 줄씩 스트리밍)
+
+    파싱에 실패한 줄은 그대로 넘겨서 db.add_memos_bulk가 행 오류로 기록하게 함
+    JSON 배열은 한 번에 파싱하므로 IMPORT_JSON_MAX_BYTES를 넘으면 RequestEntityTooLarge
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line.decode('utf-8', 'replace')
+        return
+    body = request.stream.read(IMPORT_JSON_MAX_BYTES + 1)
+    if len(body) > IMPORT_JSON_MAX_BYTES:
+        raise RequestEntityTooLarge()
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get('items', [])
+    if not isinstance(data, list):
+        raise ValueError('JSON 배열이어야 합니다')
+    yield from data
+
+@app.post('/api/memos/import')
+def import_memos():
+    """NDJSON 또는 JSON 배열로 메모 일괄 가져오기
+
+    NDJSON(application/x-ndjson)은 크기 제한 없이 한 줄씩 처리,
+    JSON 배열은 IMPORT_JSON_MAX_BYTES까지만 받음 (넘으면 413)
+    """
+    if 'username' not in session:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    user_id = current_user_id()
+    if user_id is None:
+        return jsonify({'error': '로그인이 필요합니다'}), 401
+    retry_after = rate_limited('memo_write', f'user:{user_id}')
+    if retry_after:
+        return too_many_requests(jsonify({'error': '요청이 너무 많습니다'}), retry_after)
+    batch_size = min(max(request.args.get('batch_size', IMPORT_BATCH_SIZE, type=int), 1), 5000)
+    if (request.mimetype not in NDJSON_MIMETYPES
+            and (request.content_length or 0) > IMPORT_JSON_MAX_BYTES):
+        return import_too_large()
+    try:
+        result = db.add_memos_bulk(user_id, iter_import_rows(), batch_size=batch_size)
+    except RequestEntityTooLarge:
+        # Content-Length 없이(chunked) 보낸 큰 본문
+        return import_too_large()
+    except ValueError as e:
+        return jsonify({'error': f'잘못된 요청 본문: {e}'}), 400
+    except db.DBError as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify(result)
+
+def buffered(chunks, size=STREAM_FLUSH_SIZE):
+    """Jinja가 잘게 내놓는 조각을 size 단위로 묶어서 write 횟수를 줄임"""
+    buf, length = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buf)
+            buf, length = [], 0
+    if buf:
+        yield ''.join(buf)
 
 @app.route('/memos')
 def view_memos():
     if 'username' not in session:
         return redirect(url_for('login'), 403)
-    username = session['username']
-    memos = db.get_memos(username)
-    return render_template('memos.html', memos=memos)
+    user_id = current_user_id()
+    # 템플릿 버전도 넣어서 마크업이 바뀐 배포 뒤에는 예전 페이지로 304를 주지 않음
+    seq = db.get_memo_seq(user_id)
+    cached = not_modified(memo_list_etag(user_id, seq, 'page', fragments.template_version))
+    if cached is not None:
+        return cached
+    seq, memos = db.get_memo_summary_page(user_id, seq=seq)
+    etag = memo_list_etag(user_id, seq, 'page', fragments.template_version)
+    if MEMO_PAGE_STREAM:
+        # 카드가 만들어지는 대로 전송해서 첫 바이트까지 시간 단축
+        response = Response(buffered(stream_template('memos.html', memos=memos)), mimetype='text/html')
+    else:
+        response = make_response(render_template('memos.html', memos=memos))
+    return with_etag(response, etag)
 @app.post('/memo/delete/<int:memo_id>')
 def delete_memo(memo_id):
     if 'username' not in session:
         return redirect(url_for('login'), 403)
-    db.delete_memo(memo_id)
+    user_id = current_user_id()
+    if user_id is None:
+        return redirect(url_for('login'), 403)
+    retry_after = rate_limited('memo_write', f'user:{user_id}')
+    if retry_after:
+        return too_many_requests(jsonify({'error': '요청이 너무 많습니다'}), retry_after)
+    try:
+        db.delete_memo(memo_id, user_id)
+    except db.DBError:
+        if account_gone():
+            return redirect(url_for('login'), 403)
+        raise
     return redirect(url_for('view_memos'))
 @app.post('/delete_account')
 def delete_account():
     if 'username' not in session:
         return redirect(url_for('login'), 403)
     username = session['username']
+    # 탈퇴 표시만 하고 바로 응답, 메모는 백그라운드에서 나눠서 삭제
     db.delete_user(username)
+    purge.wake()
     session.pop('username')
+    session.pop('user_id', None)
     return redirect(url_for('home'))
 
+@app.get('/metrics')
+def metrics_endpoint():
+    """Prometheus 텍스트 형식 메트릭 (METRICS_DIR 설정 시 모든 워커 합산)"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
     app.run(debug=os.getenv('DEBUG', False), host='0.0.0.0', port=14444)
@@ -0,0 +1,59 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+# 로그 레벨 (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 성공 메시지 중 실제로 남길 비율 (0.0 ~ 1.0) - 경고/오류는 항상 남김
+LOG_SUCCESS_SAMPLE_RATE = float(os.getenv('LOG_SUCCESS_SAMPLE_RATE', 0.1))
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] pid=%(process)d %(message)s'
+
+_lock = threading.Lock()
+_listener = None
+_listener_pid = None
+
+def setup_logging():
+    """'memo' 로거에 비동기 QueueHandler 설정 (프로세스당 한 번)
+
+    요청 스레드는 큐에 넣기만 하고, 실제 stdout 쓰기는 QueueListener 스레드가 처리
+    gunicorn이 fork한 워커에서는 리스너 스레드를 새로 시작함
+    """
+    global _listener, _listener_pid
+    with _lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            return
+        log_queue = queue.SimpleQueue()
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(logging.Formatter(LOG_FORMAT))
+        listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+        listener.start()
+
+        root = logging.getLogger('memo')
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False
+
+        _listener, _listener_pid = listener, os.getpid()
+        atexit.register(listener.stop)
+
+def get_logger(name):
+    """'memo.<name>' 로거 반환"""
+    setup_logging()
+    return logging.getLogger(f'memo.{name}')
+
+def success(logger, msg, *args):
+    """성공 경로 로그 - INFO가 켜져 있을 때 LOG_SUCCESS_SAMPLE_RATE 비율로만 기록
+
+    메시지 포맷팅은 기록될 때만 일어남
+    """
+    if LOG_SUCCESS_SAMPLE_RATE <= 0 or not logger.isEnabledFor(logging.INFO):
+        return
+    if LOG_SUCCESS_SAMPLE_RATE >= 1 or random.random() < LOG_SUCCESS_SAMPLE_RATE:
+        logger.info(msg, *args)
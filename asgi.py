@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+
+from a2wsgi import WSGIMiddleware
+from dotenv import load_dotenv
+
+import applog
+import db
+import events
+import metrics
+from app import app as flask_app
+
+load_dotenv()
+
+log = applog.get_logger('asgi')
+
+# 프로세스 하나가 동시에 처리할 수 있는 요청 수 (WSGI 앱을 실행하는 스레드 수)
+# 기본값: DB 커넥션 풀 상한 + SSE 스트림 수 - 그보다 많은 스레드는 풀 대기(DB_POOL_TIMEOUT)만 늘림
+ASGI_THREADS = int(os.getenv('ASGI_THREADS',
+                             int(os.getenv('DB_POOL_MAX', 10)) + events.EVENT_MAX_STREAMS))
+# 스레드를 기다리는 요청까지 포함해 동시에 받을 요청 수 - 넘으면 대기열에 쌓지 않고 바로 503 (0이면 제한 없음)
+ASGI_MAX_INFLIGHT = int(os.getenv('ASGI_MAX_INFLIGHT', ASGI_THREADS * 2))
+# SSE 스트림 수 상한을 WSGI THREADS 대신 이 스레드 수 기준으로 계산
+events.set_request_threads(ASGI_THREADS)
+
+class MemoASGI:
+    """Flask 앱을 ASGI로 노출
+
+    이벤트 루프가 연결을 받고, 요청 처리는 ASGI_THREADS개의 스레드에서 실행
+    OAuth/DB 응답을 기다리는 요청이 있어도 워커 수 이상의 연결을 동시에 처리 가능
+    """
+
+    def __init__(self, wsgi_app, threads, max_inflight=0):
+        self._wsgi = WSGIMiddleware(wsgi_app, workers=threads)
+        self.max_inflight = max_inflight
+        # 이벤트 루프 하나에서만 바뀌므로 잠금 불필요
+        self._inflight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http' or not self.max_inflight:
+            await self._wsgi(scope, receive, send)
+            return
+        if self._inflight >= self.max_inflight:
+            await self._reject(send)
+            return
+        self._inflight += 1
+        try:
+            await self._wsgi(scope, receive, send)
+        finally:
+            self._inflight -= 1
+
+    async def _reject(self, send):
+        metrics.inc('memo_admission_rejected_total', reason='asgi_inflight')
+        body = json.dumps({'error': '요청이 많습니다. 잠시 후 다시 시도하세요.'}).encode()
+        await send({'type': 'http.response.start', 'status': 503, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'retry-after', b'1'),
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    # DB 연결 준비 + 스키마 확인 (블로킹이라 이벤트 루프 밖에서)
+                    await asyncio.to_thread(db.get_backend().warmup)
+                except Exception as e:
+                    # DB가 늦게 뜨는 경우에도 서버는 시작하고 첫 요청 때 다시 연결
+                    log.warning("DB warmup failed: %s", e)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.to_thread(db.close_db)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+app = MemoASGI(flask_app, ASGI_THREADS, ASGI_MAX_INFLIGHT)
@@ -0,0 +1,425 @@
+"""메모 앱 부하 테스트 / 벤치마크
+
+N명 x M개 메모를 시드한 뒤 각 라우트와 db.py 함수의 지연시간(p50/p95/p99)과
+처리량(req/s)을 측정하고 결과를 JSON으로 저장함
+
+    # 로컬 MySQL에 시드하고 앱을 프로세스 안에서 띄워 측정
+    DATABASE_URL=mysql://root:pw@127.0.0.1:3306/memo_bench python bench.py --users 20 --memos 500
+
+    # 내장 SQLite로 측정 (MySQL 서버 없이)
+    python bench.py --database-url sqlite:////tmp/memo_bench.db --users 20 --memos 500
+
+    # 이미 떠 있는 서버(gunicorn 등) 측정, 이전 결과와 비교
+    python bench.py --url http://127.0.0.1:8000 --compare baseline.json --output current.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROUTES = ['home', 'api_memos', 'api_memo', 'api_memo_changes', 'memos_page', 'add_memo', 'login', 'delete_memo', 'delete_account', 'oauth_callback']
+MICRO = ['add_user', 'verify_user', 'user_exists', 'add_memo', 'add_memos_bulk', 'get_memos_page',
+         'get_memos_all', 'get_memo_summaries', 'get_memo', 'get_memos_version', 'get_memo_changes', 'iter_memo_chunks', 'search_memos', 'delete_memo', 'delete_user']
+
+BENCH_PASSWORD = 'bench-password'
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='메모 앱 벤치마크')
+    parser.add_argument('--database-url', help='DATABASE_URL (db 모듈 로드 전에 설정)')
+    parser.add_argument('--url', help='측정할 서버 주소 (없으면 앱을 프로세스 안에서 실행)')
+    parser.add_argument('--users', type=int, default=10, help='시드할 사용자 수')
+    parser.add_argument('--memos', type=int, default=200, help='사용자당 메모 수')
+    parser.add_argument('--skip-seed', action='store_true', help='이미 시드된 데이터 사용')
+    parser.add_argument('--concurrency', type=int, default=8, help='동시 클라이언트 수')
+    parser.add_argument('--requests', type=int, default=200, help='라우트별 요청 수')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='측정할 라우트 (쉼표 구분)')
+    parser.add_argument('--micro', default=','.join(MICRO), help='측정할 db 함수 (쉼표 구분, 빈 값이면 생략)')
+    parser.add_argument('--micro-iterations', type=int, default=100)
+    parser.add_argument('--no-cache', action='store_true', help='메모 캐시 끄고 측정 (MEMO_CACHE_URL=none://)')
+    parser.add_argument('--oauth-stub', action='store_true', help='로컬 OAuth 스텁으로 Google 콜백 측정')
+    parser.add_argument('--output', default='bench_results.json', help='결과 JSON 경로')
+    parser.add_argument('--compare', help='비교할 이전 결과 JSON')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='회귀로 판단할 p95 증가/처리량 감소 비율')
+    return parser.parse_args(argv)
+
+def percentile(sorted_values, pct):
+    """nearest-rank 백분위수"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies, errors, wall_seconds):
+    values = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'count': len(values),
+        'errors': errors,
+        'mean_ms': ms(statistics.fmean(values)) if values else None,
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1]) if values else None,
+        'rps': round(len(values) / wall_seconds, 2) if wall_seconds > 0 else None,
+    }
+
+def run_concurrent(operation, total, concurrency, prepare=None):
+    """operation(i)를 total번, concurrency개 스레드로 실행하고 지연시간 집계
+
+    prepare(i)가 있으면 측정 전에 실행해서 그 결과를 operation에 넘김 (측정 시간에서 제외)
+    operation이 False를 반환하거나 예외를 던지면 오류로 계산
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(i):
+        nonlocal errors
+        try:
+            context = prepare(i) if prepare else None
+            start = time.perf_counter()
+            ok = operation(i, context) if prepare else operation(i)
+            elapsed = time.perf_counter() - start
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            if ok is False:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(total)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+def bench_username(i):
+    return f'bench_user_{i}'
+
+def seed(db, users, memos):
+    """bench_user_0..N-1 에게 메모가 M개가 되도록 채움"""
+    for i in range(users):
+        username = bench_username(i)
+        user_id = db.get_user_id(username) or db.add_user(username, BENCH_PASSWORD)
+        # get_memos_version은 변경 순번(추가+삭제 수)이라 메모 수로 쓸 수 없음
+        with db.connection(read=True) as (_, cur):
+            cur.execute("SELECT COUNT(*) FROM memos WHERE user_id = %s", (user_id,))
+            missing = memos - cur.fetchone()[0]
+        if missing > 0:
+            rows = ({'title': f'벤치마크 메모 {n}', 'content': f'{username}의 {n}번째 메모 내용입니다. ' * 4}
+                    for n in range(missing))
+            db.add_memos_bulk(user_id, rows, batch_size=1000)
+        print(f"  seeded {username}: {memos} memos", file=sys.stderr)
+
+class Client:
+    """스레드별 로그인된 HTTP 세션"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+        self._requests = requests
+
+    def session(self, username, password=BENCH_PASSWORD):
+        sessions = getattr(self._local, 'sessions', None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        session = sessions.get(username)
+        if session is None:
+            session = self._requests.Session()
+            self.login(session, username, password)
+            sessions[username] = session
+        return session
+
+    def login(self, session, username, password=BENCH_PASSWORD):
+        response = session.post(self.base_url + '/login', data={'username': username, 'password': password},
+                                allow_redirects=False)
+        return response.status_code == 302
+
+    def anonymous(self):
+        return self._requests.Session()
+
+def bench_routes(args, client, db, routes):
+    results = {}
+    users = max(1, args.users)
+    user_for = lambda i: bench_username(i % users)
+    url = client.base_url
+
+    def ok(response, *codes):
+        return response.status_code in (codes or (200,))
+
+    if 'home' in routes:
+        results['GET /'] = run_concurrent(
+            lambda i: ok(client.session(user_for(i)).get(url + '/')), args.requests, args.concurrency)
+    if 'api_memos' in routes:
+        results['GET /api/memos'] = run_concurrent(
+            lambda i: ok(client.session(user_for(i)).get(url + '/api/memos')), args.requests, args.concurrency)
+    if 'api_memo' in routes:
+        def prepare(i):
+            username = user_for(i)
+            return username, db.get_memo_summaries(db.get_user_id(username), limit=1)[0][0]
+
+        results['GET /api/memos/<id>'] = run_concurrent(
+            lambda i, ctx: ok(client.session(ctx[0]).get(f'{url}/api/memos/{ctx[1]}')),
+            args.requests, args.concurrency, prepare=prepare)
+    if 'api_memo_changes' in routes:
+        # 최근 변경 10개를 따라잡는 클라이언트
+        def prepare(i):
+            username = user_for(i)
+            return username, max(0, db.get_memo_seq(db.get_user_id(username)) - 10)
+
+        results['GET /api/memos/changes'] = run_concurrent(
+            lambda i, ctx: ok(client.session(ctx[0]).get(f'{url}/api/memos/changes?since={ctx[1]}')),
+            args.requests, args.concurrency, prepare=prepare)
+    if 'memos_page' in routes:
+        results['GET /memos'] = run_concurrent(
+            lambda i: ok(client.session(user_for(i)).get(url + '/memos')), args.requests, args.concurrency)
+    if 'add_memo' in routes:
+        results['POST /memo'] = run_concurrent(
+            lambda i: ok(client.session(user_for(i)).post(
+                url + '/memo', data={'title': f'bench {i}', 'content': 'benchmark body'},
+                allow_redirects=False), 302),
+            args.requests, args.concurrency)
+    if 'login' in routes:
+        results['POST /login'] = run_concurrent(
+            lambda i: client.login(client.anonymous(), user_for(i)), args.requests, args.concurrency)
+    if 'delete_memo' in routes:
+        # 측정 전에 지울 메모를 만들어 둠
+        def prepare(i):
+            username = user_for(i)
+            user_id = db.get_user_id(username)
+            db.add_memo(f'delete me {i}', 'to be deleted', user_id)
+            return username, db.get_memos(user_id, limit=1)[0][0]
+
+        results['POST /memo/delete/<id>'] = run_concurrent(
+            lambda i, ctx: ok(client.session(ctx[0]).post(
+                f'{url}/memo/delete/{ctx[1]}', allow_redirects=False), 302),
+            args.requests, args.concurrency, prepare=prepare)
+    if 'delete_account' in routes:
+        def prepare(i):
+            username = f'bench_delete_{os.getpid()}_{i}_{time.time_ns()}'
+            user_id = db.add_user(username, BENCH_PASSWORD)
+            db.add_memos_bulk(user_id, ({'title': 't', 'content': 'c'} for _ in range(20)))
+            session = client.anonymous()
+            client.login(session, username)
+            return session
+
+        results['POST /delete_account'] = run_concurrent(
+            lambda i, session: ok(session.post(url + '/delete_account', allow_redirects=False), 302),
+            max(1, args.requests // 4), args.concurrency, prepare=prepare)
+    if 'oauth_callback' in routes and args.oauth_stub:
+        def prepare(i):
+            session = client.anonymous()
+            location = session.get(url + '/auth/google', allow_redirects=False).headers.get('Location', '')
+            state = re.search(r'[?&]state=([^&]+)', location).group(1)
+            return session, state
+
+        results['GET /auth/google/callback'] = run_concurrent(
+            lambda i, ctx: ok(ctx[0].get(
+                f'{url}/auth/google/callback?state={ctx[1]}&code=user-bench{i % users}',
+                allow_redirects=False), 302),
+            args.requests, args.concurrency, prepare=prepare)
+    return results
+
+def bench_micro(args, db, names):
+    results = {}
+    n = args.micro_iterations
+    users = max(1, args.users)
+    user_for = lambda i: bench_username(i % users)
+    user_ids = {}
+
+    def id_for(i):
+        username = user_for(i)
+        if username not in user_ids:
+            user_ids[username] = db.get_user_id(username)
+        return user_ids[username]
+
+    stamp = f'{os.getpid()}_{time.time_ns()}'
+
+    def timed(name, operation, total=n, prepare=None):
+        results[name] = run_concurrent(operation, total, 1, prepare=prepare)
+
+    if 'add_user' in names:
+        timed('add_user', lambda i: db.add_user(f'bench_micro_{stamp}_{i}', BENCH_PASSWORD))
+    if 'verify_user' in names:
+        timed('verify_user', lambda i: db.verify_user(user_for(i), BENCH_PASSWORD))
+    if 'user_exists' in names:
+        timed('user_exists', lambda i: db.user_exists(user_for(i)))
+    if 'add_memo' in names:
+        timed('add_memo', lambda i: db.add_memo(f'micro {i}', 'micro body', id_for(i)))
+    if 'add_memos_bulk' in names:
+        timed('add_memos_bulk (100 rows)', lambda i: db.add_memos_bulk(
+            id_for(i), ({'title': 'bulk', 'content': 'bulk body'} for _ in range(100))),
+            total=max(1, n // 10))
+    if 'get_memos_page' in names:
+        timed('get_memos (limit=30)', lambda i: db.get_memos(id_for(i), limit=30))
+    if 'get_memos_all' in names:
+        timed('get_memos (all)', lambda i: db.get_memos(id_for(i)), total=max(1, n // 10))
+    if 'get_memo_summaries' in names:
+        timed('get_memo_summaries (limit=30)', lambda i: db.get_memo_summaries(id_for(i), limit=30))
+    if 'get_memo' in names:
+        def prepare(i):
+            return db.get_memo_summaries(id_for(i), limit=1)[0][0]
+
+        timed('get_memo', lambda i, memo_id: db.get_memo(memo_id, id_for(i)), prepare=prepare)
+    if 'get_memos_version' in names:
+        timed('get_memos_version', lambda i: db.get_memos_version(id_for(i)))
+    if 'get_memo_changes' in names:
+        def prepare(i):
+            return max(0, db.get_memo_seq(id_for(i)) - 10)
+
+        timed('get_memo_changes (10 behind)', lambda i, since: db.get_memo_changes(id_for(i), since),
+              prepare=prepare)
+    if 'iter_memo_chunks' in names:
+        timed('iter_memo_chunks (all)', lambda i: sum(len(c) for c in db.iter_memo_chunks(id_for(i))),
+              total=max(1, n // 10))
+    if 'search_memos' in names:
+        timed('search_memos', lambda i: db.search_memos(id_for(i), '메모 내용', limit=20))
+    if 'delete_memo' in names:
+        def prepare(i):
+            db.add_memo('micro delete', 'body', id_for(i))
+            return db.get_memos(id_for(i), limit=1)[0][0]
+
+        timed('delete_memo', lambda i, memo_id: db.delete_memo(memo_id, id_for(i)), prepare=prepare)
+    if 'delete_user' in names:
+        def prepare(i):
+            username = f'bench_micro_del_{stamp}_{i}'
+            user_id = db.add_user(username, BENCH_PASSWORD)
+            db.add_memos_bulk(user_id, ({'title': 't', 'content': 'c'} for _ in range(20)))
+            return username
+
+        timed('delete_user (20 memos, purge queued)', lambda i, username: db.delete_user(username),
+              total=max(1, n // 4), prepare=prepare)
+    return results
+
+def start_local_server(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, name='bench-server', daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(current, baseline, threshold):
+    """p95가 threshold 이상 늘었거나 처리량이 threshold 이상 줄어든 항목 목록"""
+    regressions = []
+    for section in ('routes', 'micro'):
+        for name, now in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            if before.get('p95_ms') and now.get('p95_ms') is not None:
+                change = now['p95_ms'] / before['p95_ms'] - 1
+                print(f"  {section:6} {name:32} p95 {before['p95_ms']:9.2f} -> {now['p95_ms']:9.2f} ms ({change:+.1%})")
+                if change > threshold:
+                    regressions.append(f'{name}: p95 {change:+.1%}')
+            if section == 'routes' and before.get('rps') and now.get('rps') is not None:
+                change = now['rps'] / before['rps'] - 1
+                if change < -threshold:
+                    regressions.append(f'{name}: rps {change:+.1%}')
+    return regressions
+
+def print_table(title, results):
+    print(f"\n{title}")
+    print(f"  {'name':34} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for name, r in results.items():
+        fmt = lambda v: f'{v:9.2f}' if v is not None else f"{'-':>9}"
+        print(f"  {name:34} {r['count']:6} {r['errors']:4} {fmt(r['p50_ms'])} {fmt(r['p95_ms'])} "
+              f"{fmt(r['p99_ms'])} {fmt(r['rps'])}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    if args.no_cache:
+        os.environ['MEMO_CACHE_URL'] = 'none://'
+    os.environ.setdefault('SECRET_KEY', 'bench-secret-key')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # 한 IP에서 같은 계정들로 반복 요청하므로 속도 제한은 끄고 측정 (설정하면 그 값 사용)
+    for rule in ('LOGIN', 'REGISTER', 'MEMO_WRITE'):
+        os.environ.setdefault(f'RATE_LIMIT_{rule}', '0')
+
+    stub_server = None
+    if args.oauth_stub:
+        import oauth_stub
+        stub_server, provider = oauth_stub.start_stub_server(bits=1024)
+        os.environ['GOOGLE_DISCOVERY_URL'] = f'{provider.issuer}/.well-known/openid-configuration'
+        os.environ.setdefault('GOOGLE_CLIENT_ID', 'bench-client')
+        os.environ.setdefault('GOOGLE_CLIENT_SECRET', 'bench-secret')
+
+    import db
+
+    if not args.skip_seed:
+        print(f"seeding {args.users} users x {args.memos} memos", file=sys.stderr)
+        seed(db, args.users, args.memos)
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        from app import app
+        server, base_url = start_local_server(app)
+
+    routes = [r for r in args.routes.split(',') if r]
+    micro = [m for m in args.micro.split(',') if m]
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git': git_revision(),
+            'target': base_url,
+            'users': args.users,
+            'memos_per_user': args.memos,
+            'concurrency': args.concurrency,
+            'requests_per_route': args.requests,
+            'cache': os.getenv('MEMO_CACHE_URL', 'default'),
+        },
+        'routes': bench_routes(args, Client(base_url), db, routes),
+        'micro': bench_micro(args, db, micro),
+    }
+
+    print_table('routes', results['routes'])
+    print_table('db.py', results['micro'])
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nresults written to {args.output}")
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.compare}")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            status = 1
+
+    if server:
+        server.shutdown()
+    if stub_server:
+        stub_server.shutdown()
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+import hashlib as hl
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+# 캐시에 키가 없을 때 get()이 돌려주는 값 (None도 캐시할 수 있도록 별도 객체 사용)
+MISS = object()
+
+class _Stats:
+    """적중/실패 카운터"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def evicted(self, count=1):
+        with self._lock:
+            self.evictions += count
+
+class NullCache:
+    """캐시 비활성화용 (항상 MISS)"""
+
+    def __init__(self):
+        self._stats = _Stats()
+
+    def get(self, key):
+        self._stats.miss()
+        return MISS
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def sweep(self):
+        return 0
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': 'none', 'hits': self._stats.hits, 'misses': self._stats.misses,
+                'evictions': 0, 'size': 0}
+
+class LRUCache:
+    """프로세스 내부 LRU 캐시 (TTL + 최대 항목 수 기준 제거)"""
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (만료 시각, 값)
+        self._lock = threading.Lock()
+        self._stats = _Stats()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self._stats.hit()
+                    return value
+                del self._data[key]
+        self._stats.miss()
+        return MISS
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._stats.evicted(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def values(self):
+        """만료되지 않은 값 목록 (통계용 - 적중/순서에는 영향 없음)"""
+        now = time.monotonic()
+        with self._lock:
+            return [value for expires_at, value in self._data.values()
+                    if expires_at is None or expires_at > now]
+
+    def sweep(self):
+        """만료된 항목 제거 (LRU로 밀려나기 전까지 남아 있는 것 정리) - 제거한 수 반환"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._data.items()
+                       if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        return {'backend': 'memory', 'hits': self._stats.hits, 'misses': self._stats.misses,
+                'evictions': self._stats.evictions, 'size': size}
+
+class FileCache:
+    """디렉터리 기반 캐시 - 같은 호스트의 gunicorn 워커끼리 공유
+
+    항목 하나당 파일 하나 (pickle), 쓰기는 임시 파일 + os.replace로 원자적으로 처리
+    항목 수가 maxsize를 넘으면 가장 오래 수정된 파일부터 제거
+    pickle을 읽으므로 디렉터리는 실행 사용자 소유이고 다른 사용자가 쓸 수 없어야 함
+    (새로 만들 때는 0700, 조건에 맞지 않으면 ValueError - 다른 사용자가 심어 둔 파일을 읽지 않음)
+    """
+
+    def __init__(self, directory, maxsize=4096, ttl=60.0):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._stats = _Stats()
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+        if not stat.S_ISDIR(info.st_mode):
+            raise ValueError(f"캐시 디렉터리가 아닙니다 (심볼릭 링크 등): {directory}")
+        if info.st_uid != os.getuid():
+            raise ValueError(f"다른 사용자 소유의 캐시 디렉터리는 사용할 수 없습니다: {directory}")
+        if info.st_mode & 0o022:
+            raise ValueError(f"그룹/다른 사용자가 쓸 수 있는 캐시 디렉터리는 사용할 수 없습니다: {directory}")
+
+    def _path(self, key):
+        name = hl.sha1(key.encode()).hexdigest()
+        return os.path.join(self.directory, name + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, stored_key, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, ValueError):
+            self._stats.miss()
+            return MISS
+        if stored_key != key or (expires_at is not None and expires_at <= time.time()):
+            self._stats.miss()
+            return MISS
+        self._stats.hit()
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((expires_at, key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._writes += 1
+            # 매번 디렉터리를 훑지 않고 일정 횟수마다 크기 확인
+            check = self._writes % 64 == 0
+        if check:
+            self._evict()
+
+    def _evict(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.cache')]
+        except OSError:
+            return
+        overflow = len(entries) - self.maxsize
+        if overflow <= 0:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        removed = 0
+        for entry in entries[:overflow]:
+            try:
+                os.unlink(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        self._stats.evicted(removed)
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        """만료된 파일 제거 - 제거한 수 반환"""
+        now = time.time()
+        removed = 0
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith('.cache')]
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                with open(entry.path, 'rb') as f:
+                    expires_at = pickle.load(f)[0]
+            except (OSError, EOFError, pickle.UnpicklingError, ValueError, IndexError, TypeError):
+                continue
+            if expires_at is not None and expires_at <= now:
+                try:
+                    os.unlink(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.cache'):
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        try:
+            size = sum(1 for e in os.scandir(self.directory) if e.name.endswith('.cache'))
+        except OSError:
+            size = 0
+        return {'backend': 'file', 'hits': self._stats.hits, 'misses': self._stats.misses,
+                'evictions': self._stats.evictions, 'size': size}
+
+def create_cache(url):
+    """URL로 캐시 백엔드 생성
+
+    - memory://?maxsize=1024&ttl=60   프로세스 내부 LRU
+    - file:///var/lib/memo/cache?ttl=60  워커 간 공유 파일 캐시 (경로를 빼면 사용자별 임시 디렉터리)
+    - none://                         캐시 사용 안 함
+    """
+    parsed = urlparse(url or 'memory://')
+    options = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+    ttl = float(options.get('ttl', 60))
+    if parsed.scheme == 'memory':
+        return LRUCache(maxsize=int(options.get('maxsize', 1024)), ttl=ttl)
+    if parsed.scheme == 'file':
+        directory = parsed.path or os.path.join(tempfile.gettempdir(), f'memo-cache-{os.getuid()}')
+        return FileCache(directory, maxsize=int(options.get('maxsize', 4096)), ttl=ttl)
+    if parsed.scheme == 'none':
+        return NullCache()
+    raise ValueError(f"지원하지 않는 캐시 URL: {url}")
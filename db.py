@@ -1,16 +1,57 @@
 import pymysql
+import pymysql.cursors
 import pymysql.err
 import pymysql.err
-import hashlib as hl
+from pymysql.constants import SERVER_STATUS
+import base64
+import contextvars
+import itertools
+import json
 import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
+import applog
+import cache
+import events
+import metrics
+import passwords
+import search
+import storage
+
 load_dotenv()
 
-DB = None
-cur = None
+log = applog.get_logger('db')
+
+_pool = None
+_pool_lock = threading.Lock()
+# get_memos 결과 캐시 (MEMO_CACHE_URL: memory://, file:///경로, none://)
+# 키에 users.memo_seq를 넣으므로 워커별 캐시여도 다른 워커의 쓰기 후 예전 항목을 쓰지 않음
+memo_cache = cache.create_cache(os.getenv('MEMO_CACHE_URL', 'memory://?maxsize=1024&ttl=60'))
+_schema_lock = threading.Lock()
 schema_initialized = False
+# MySQL FULLTEXT(ngram) 인덱스 사용 가능 여부 (ensure_schema에서 확인)
+fulltext_enabled = False
+# 사용자 조회 캐시 (username -> (id, password_hash), 없는 사용자는 None을 짧게 캐시)
+# 워커별 캐시이므로 다른 워커의 가입/탈퇴는 TTL이 지나야 반영됨
+# 그래서 로그인은 캐시 없이 조회하고, 메모 조회/쓰기는 users.deleted_at을 직접 확인
+_users = cache.LRUCache(maxsize=int(os.getenv('USER_CACHE_SIZE', 4096)),
+                        ttl=float(os.getenv('USER_CACHE_TTL', 300)))
+USER_CACHE_NEGATIVE_TTL = float(os.getenv('USER_CACHE_NEGATIVE_TTL', 5))
+# FULLTEXT를 못 쓸 때 사용하는 사용자별 메모리 역색인 (user_id -> _SearchIndexEntry)
+# 색인에는 메모 본문도 들어가므로 워커 메모리는 최근 검색한 SEARCH_INDEX_USERS명의 메모 크기에 비례
+# (memo_search_index_memos 게이지로 확인)
+_search_indexes = cache.LRUCache(maxsize=int(os.getenv('SEARCH_INDEX_USERS', 64)), ttl=600)
+_search_indexes_lock = threading.Lock()
+# 색인이 이보다 많은 변경 기록만큼 뒤처졌으면 따라잡지 않고 새로 만듦
+SEARCH_INDEX_REPLAY_MAX = int(os.getenv('SEARCH_INDEX_REPLAY_MAX', 500))
+# 사용자별로 남겨 둘 최근 변경 기록 수 (더 오래된 since는 목록 전체를 다시 받아야 함, 0이면 무제한)
+MEMO_CHANGES_RETENTION = int(os.getenv('MEMO_CHANGES_RETENTION', 1000))
 
 class DBError(Exception):
     """데이터베이스 관련 커스텀 예외"""
@@ -45,7 +86,7 @@ def normalize_db_config(db_config):
         host_is_host = looks_like_hostname(host)
         user_is_host = looks_like_hostname(user)
         if (not host_is_host) and user_is_host:
-            print("[db] ! Detected swapped host/user; auto-correcting")
+            log.warning("Detected swapped host/user; auto-correcting")
             db_config['host'], db_config['user'] = user, host
     return db_config
 
@@ -55,7 +96,7 @@ def build_db_config():
     db_url = os.getenv('DATABASE_URL') or os.getenv('MYSQL_URL') or os.getenv('DB_URL')
     if db_url:
         if '://' not in db_url:
-            print("[db] ! DATABASE_URL missing scheme; ignoring")
+            log.warning("DATABASE_URL missing scheme; ignoring")
         else:
             return normalize_db_config(parse_database_url(db_url))
 
@@ -98,23 +139,758 @@ def build_db_config():
         'port': int(os.getenv('DB_PORT', 3306)),
     })
 
-def reset_connection():
-    """연결 초기화 (재연결 필요할 때)"""
-    global DB, cur, schema_initialized
+class _PooledConnection:
+    """풀에서 관리되는 커넥션과 생성/사용 시각"""
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+class ConnectionPool:
+    """스레드 안전한 상한 있는 커넥션 풀
+
+    - min_size: 처음 만들 때 미리 열어두는 커넥션 수
+    - max_size: 동시에 열 수 있는 최대 커넥션 수
+    - timeout: 풀이 가득 찼을 때 checkout 대기 시간(초)
+    - max_lifetime: 이 시간(초)보다 오래된 커넥션은 폐기 후 새로 생성
+    - idle_check: 이 시간(초) 이상 쉬었던 커넥션은 꺼낼 때 ping으로 확인
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, timeout=10.0,
+                 max_lifetime=1800.0, idle_check=30.0):
+        if max_size < 1:
+            raise ValueError("max_size는 1 이상이어야 합니다")
+        self._factory = factory
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.idle_check = idle_check
+        self._idle = deque()
+        self._size = 0
+        # 끊겨서 버렸지만 아직 새로 열지 않은 커넥션 수 (새로 열 때 재연결로 기록)
+        self._broken = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def fill(self):
+        """min_size 만큼 커넥션을 미리 생성"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = self._connect()
+            except Exception:
+                self._release_slot()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+    def _connect(self):
+        """새 커넥션 생성 - 끊긴 커넥션을 대신하는 것이면 memo_db_reconnects_total 증가"""
+        entry = _PooledConnection(self._factory())
+        with self._cond:
+            replaces_broken = self._broken > 0
+            if replaces_broken:
+                self._broken -= 1
+        if replaces_broken:
+            metrics.inc('memo_db_reconnects_total')
+        return entry
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _expired(self, entry, now):
+        return self.max_lifetime and now - entry.created_at > self.max_lifetime
+
+    @staticmethod
+    def _close_quietly(entry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+
+    def checkout(self):
+        """커넥션 대여 (timeout 안에 못 얻으면 DBError)"""
+        with metrics.timer('memo_db_pool_wait_seconds'):
+            return self._checkout()
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = None
+            stale = []
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise DBError("커넥션 풀이 닫혀 있습니다")
+                    now = time.monotonic()
+                    while self._idle:
+                        candidate = self._idle.pop()
+                        if self._expired(candidate, now):
+                            self._size -= 1
+                            stale.append(candidate)
+                            continue
+                        entry = candidate
+                        break
+                    if entry is not None:
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise DBError("데이터베이스 커넥션 대기 시간 초과")
+                    self._cond.wait(remaining)
+            for old in stale:
+                self._close_quietly(old)
+
+            if entry is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            # 오래 쉬었던 커넥션은 살아있는지 확인
+            if self.idle_check and time.monotonic() - entry.last_used > self.idle_check:
+                try:
+                    entry.conn.ping(reconnect=False)
+                except Exception:
+                    log.warning("Dropping dead pooled connection")
+                    metrics.inc('memo_db_dropped_connections_total')
+                    self._close_quietly(entry)
+                    with self._cond:
+                        self._broken += 1
+                    self._release_slot()
+                    continue
+            return entry
+
+    def checkin(self, entry, discard=False):
+        """커넥션 반납 (discard=True면 닫고 버림)"""
+        if not discard:
+            try:
+                # 읽기만 하고 끝난 트랜잭션도 정리해야 다음 사용자가 최신 스냅샷을 봄
+                if entry.conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    entry.conn.rollback()
+            except Exception:
+                discard = True
+        now = time.monotonic()
+        with self._cond:
+            if discard or self._closed or self._expired(entry, now):
+                if discard and not self._closed:
+                    self._broken += 1
+                self._size -= 1
+                self._cond.notify()
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._close_quietly(entry)
+
+    def stats(self):
+        """현재 커넥션 수 (idle: 대기 중, in_use: 대여 중)"""
+        with self._cond:
+            idle = len(self._idle)
+            return {'idle': idle, 'in_use': self._size - idle}
+
+    def close(self):
+        """대기 중인 커넥션을 모두 닫고 풀을 종료"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            self._close_quietly(entry)
+
+def _env_number(name, default, cast=int):
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
     try:
-        if cur:
-            cur.close()
-        if DB:
-            DB.close()
-    except:
+        return cast(value)
+    except ValueError:
+        log.warning("Invalid %s=%r; using %s", name, value, default)
+        return default
+
+def _connect(db_config, schema=True):
+    """새 커넥션 생성 (풀 factory) - 읽기 전용 복제본은 schema=False로 스키마 확인 생략"""
+    global schema_initialized
+    # 디버그: 비밀번호는 마스킹해서 로그에 남김
+    masked = db_config.copy()
+    if 'password' in masked and masked['password']:
+        masked['password'] = '****'
+    log.info("connecting with: %s", masked)
+
+    conn = None
+    try:
+        # 연결 타임아웃 설정
+        conn = pymysql.connect(
+            host=db_config['host'],
+            user=db_config['user'],
+            password=db_config['password'],
+            database=db_config['database'],
+            port=db_config['port'],
+            charset='utf8mb4',
+            connect_timeout=30,
+            read_timeout=30,
+            write_timeout=30,
+            autocommit=False
+        )
+        with conn.cursor() as cur:
+            # 연결 확인
+            cur.execute("SELECT 1")
+            log.info("Connection successful")
+            if not schema:
+                return conn
+            with _schema_lock:
+                # 프로세스당 한 번만 (풀을 다시 만들어도 반복하지 않음)
+                if not schema_initialized:
+                    ensure_schema(conn, cur)
+                    schema_initialized = True
+        return conn
+    except pymysql.err.OperationalError as e:
+        log.error("Operational error: %s", e)
+        log.error("Config: %s", masked)
+        _close_raw(conn)
+        raise DBError(f"데이터베이스 연결 실패: {str(e)}")
+    except pymysql.err.ProgrammingError as e:
+        log.error("Programming error: %s", e)
+        _close_raw(conn)
+        raise DBError(f"SQL 오류: {str(e)}")
+    except DBError:
+        _close_raw(conn)
+        raise
+    except Exception as e:
+        log.error("Unexpected error: %s: %s", type(e).__name__, e)
+        _close_raw(conn)
+        raise DBError(f"연결 오류: {str(e)}")
+
+def _close_raw(conn):
+    try:
+        if conn:
+            conn.close()
+    except Exception:
         pass
-    DB = None
-    cur = None
-    schema_initialized = False
 
-def ensure_schema():
+def _create_pool(db_config, schema=True):
+    return ConnectionPool(
+        lambda: _connect(db_config, schema),
+        min_size=_env_number('DB_POOL_MIN', 1),
+        max_size=_env_number('DB_POOL_MAX', 10),
+        timeout=_env_number('DB_POOL_TIMEOUT', 10.0, float),
+        max_lifetime=_env_number('DB_POOL_MAX_LIFETIME', 1800.0, float),
+        idle_check=_env_number('DB_POOL_IDLE_CHECK', 30.0, float),
+    )
+
+def get_pool():
+    """프로세스 공용 primary 커넥션 풀 (처음 호출 시 생성)"""
+    global _pool
+    pool = _pool
+    if pool is not None:
+        return pool
+    with _pool_lock:
+        if _pool is None:
+            pool = _create_pool(build_db_config())
+            pool.fill()
+            _pool = pool
+        return _pool
+
+# 쓰기 직후 이 시간(초) 동안은 같은 세션의 읽기도 primary로 보냄 (복제 지연 대비)
+READ_YOUR_WRITES_WINDOW = _env_number('DB_READ_YOUR_WRITES', 5.0, float)
+
+# 요청 단위 라우팅 상태 {'primary': 읽기도 primary로, 'wrote': primary에 쓰기 발생}
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+def start_routing(primary=False):
+    """요청 시작 시 호출 - primary=True면 이 요청의 읽기도 primary에서 처리"""
+    _routing.set({'primary': primary, 'wrote': False})
+
+def wrote_to_primary():
+    """현재 요청에서 primary에 쓰기가 있었는지 (세션에 쓰기 시각을 남기는 용도)"""
+    state = _routing.get()
+    return bool(state and state['wrote'])
+
+def finish_routing():
+    """요청 끝 - 라우팅 상태 정리"""
+    _routing.set(None)
+
+class _Replica:
+    """읽기 복제본 하나 - 커넥션 풀, 장애 시각, ping 지연시간(EWMA)"""
+
+    def __init__(self, name, db_config):
+        self.name = name
+        self.db_config = db_config
+        self.pool = _create_pool(db_config, schema=False)
+        self.down_until = 0.0
+        self.latency = None
+
+    def observe(self, seconds):
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+class ReplicaRouter:
+    """읽기 쿼리를 건강한 복제본에 분배
+
+    - strategy: round_robin(차례대로) 또는 least_latency(ping 지연시간이 가장 짧은 곳)
+    - 커넥션/쿼리 오류가 난 복제본은 retry_after초 동안 제외하고 primary로 대체
+    - 백그라운드 스레드가 check_interval초마다 ping으로 상태와 지연시간 갱신
+    """
+
+    def __init__(self, urls, strategy='round_robin', retry_after=30.0, check_interval=10.0):
+        if strategy not in ('round_robin', 'least_latency'):
+            log.warning("Unknown DB_REPLICA_STRATEGY=%r; using round_robin", strategy)
+            strategy = 'round_robin'
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self.check_interval = check_interval
+        self.replicas = [
+            _Replica(urlparse(url).hostname or f'replica{i}',
+                     normalize_db_config(parse_database_url(url)))
+            for i, url in enumerate(urls)
+        ]
+        self._counter = itertools.count()
+        if check_interval > 0:
+            threading.Thread(target=self._health_loop, name='db-replica-health', daemon=True).start()
+
+    def pick(self):
+        """읽기에 쓸 복제본 (모두 장애면 None → primary 사용)"""
+        now = time.monotonic()
+        healthy = [replica for replica in self.replicas if replica.down_until <= now]
+        if not healthy:
+            return None
+        if self.strategy == 'least_latency':
+            # 아직 측정 전인 복제본을 먼저 써서 지연시간을 재도록 함
+            return min(healthy, key=lambda replica: replica.latency or 0.0)
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_down(self, replica, error):
+        if replica.down_until <= time.monotonic():
+            log.warning("Replica %s unavailable for %.0fs: %s", replica.name, self.retry_after, error)
+        replica.down_until = time.monotonic() + self.retry_after
+        metrics.inc('memo_db_replica_failures_total', replica=replica.name)
+
+    def check(self, replica):
+        """ping 한 번으로 상태/지연시간 갱신"""
+        started = time.perf_counter()
+        try:
+            entry = replica.pool.checkout()
+        except Exception as e:
+            self.mark_down(replica, e)
+            return
+        discard = False
+        try:
+            entry.conn.ping(reconnect=False)
+            replica.observe(time.perf_counter() - started)
+            if replica.down_until > time.monotonic():
+                log.info("Replica %s is back", replica.name)
+            replica.down_until = 0.0
+        except Exception as e:
+            discard = True
+            self.mark_down(replica, e)
+        finally:
+            replica.pool.checkin(entry, discard=discard)
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            for replica in self.replicas:
+                self.check(replica)
+
+    def stats(self):
+        now = time.monotonic()
+        return {replica.name: replica.down_until <= now for replica in self.replicas}
+
+    def reset(self):
+        """복제본 커넥션을 모두 닫고 새 풀로 교체 (상태 확인 스레드는 유지)"""
+        for replica in self.replicas:
+            old, replica.pool = replica.pool, _create_pool(replica.db_config, schema=False)
+            old.close()
+
+class MySQLBackend(storage.StorageBackend):
+    """pymysql + ConnectionPool 백엔드 (원격 MySQL, build_db_config로 접속 정보 결정)
+
+    DATABASE_REPLICA_URLS(쉼표 구분)를 설정하면 read=True 연결은 복제본으로 분배
+    """
+
+    name = 'mysql'
+
+    def __init__(self, replica_urls=()):
+        self.replicas = None
+        if replica_urls:
+            self.replicas = ReplicaRouter(
+                replica_urls,
+                strategy=os.getenv('DB_REPLICA_STRATEGY', 'round_robin'),
+                retry_after=_env_number('DB_REPLICA_RETRY', 30.0, float),
+                check_interval=_env_number('DB_REPLICA_CHECK_INTERVAL', 10.0, float),
+            )
+            log.info("Read replicas: %s (%s)",
+                     ', '.join(replica.name for replica in self.replicas.replicas),
+                     self.replicas.strategy)
+
+    def _checkout(self, read):
+        """(pool, 복제본 또는 None, entry) - 복제본 대여 실패 시 primary로 대체"""
+        state = _routing.get()
+        if read and self.replicas and not (state and state['primary']):
+            replica = self.replicas.pick()
+            if replica is not None:
+                try:
+                    entry = replica.pool.checkout()
+                    metrics.inc('memo_db_reads_total', target='replica')
+                    return replica.pool, replica, entry
+                except DBError as e:
+                    self.replicas.mark_down(replica, e)
+        if state is not None and not read:
+            # 이후 읽기는 방금 쓴 내용이 보이도록 primary에서
+            state['primary'] = state['wrote'] = True
+        if read:
+            metrics.inc('memo_db_reads_total', target='primary')
+        pool = get_pool()
+        return pool, None, pool.checkout()
+
+    @contextmanager
+    def connection(self, read=False):
+        """풀에서 커넥션을 빌려 (DB, cur)를 넘겨주고, 끝나면 반납
+
+        read=True면 복제본 사용 가능 (복제본이 없거나 모두 장애면 primary)
+        OperationalError가 나면 해당 커넥션만 버리고 예외는 그대로 올려보냄
+        """
+        pool, replica, entry = self._checkout(read)
+        discard = False
+        try:
+            with entry.conn.cursor() as cur:
+                yield entry.conn, cur
+        except pymysql.err.OperationalError as e:
+            discard = True
+            metrics.inc('memo_db_query_errors_total', query=metrics.current_query.get())
+            if replica is not None:
+                self.replicas.mark_down(replica, e)
+            raise
+        except pymysql.err.MySQLError:
+            metrics.inc('memo_db_query_errors_total', query=metrics.current_query.get())
+            raise
+        except GeneratorExit:
+            # 스트리밍 도중 중단되면 남은 결과를 읽어내지 않고 커넥션을 버림
+            discard = True
+            raise
+        finally:
+            pool.checkin(entry, discard=discard)
+
+    def stream_cursor(self, DB):
+        return DB.cursor(pymysql.cursors.SSCursor)
+
+    def read_target(self):
+        """지금 읽기가 향할 곳 - 'primary' 또는 'replica' (캐시 키 구분용)"""
+        state = _routing.get()
+        if not self.replicas or (state and state['primary']):
+            return 'primary'
+        return 'replica'
+
+    def warmup(self):
+        get_pool()
+
+    def reset(self):
+        global _pool
+        with _pool_lock:
+            pool, _pool = _pool, None
+        if pool is not None:
+            pool.close()
+        if self.replicas:
+            self.replicas.reset()
+
+    def stats(self):
+        pool = _pool
+        return pool.stats() if pool is not None else {}
+
+# 백엔드 공통 예외 (except 절에서 그대로 사용)
+OperationalError = (pymysql.err.OperationalError, sqlite3.OperationalError)
+IntegrityError = (pymysql.err.IntegrityError, sqlite3.IntegrityError)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(url=None):
+    """URL 스킴으로 저장소 백엔드 선택
+
+    - sqlite:///상대경로.db, sqlite:////절대경로.db, sqlite:///:memory: → 내장 SQLite
+    - 그 밖의 스킴이나 URL이 없으면 → MySQL (build_db_config의 환경변수 규칙)
+      DATABASE_REPLICA_URLS가 있으면 읽기 복제본 라우팅 사용
+    """
+    if url is None:
+        url = os.getenv('DATABASE_URL') or os.getenv('MYSQL_URL') or os.getenv('DB_URL')
+    replica_urls = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    if url and urlparse(url).scheme == 'sqlite':
+        if replica_urls:
+            log.warning("DATABASE_REPLICA_URLS is ignored for the SQLite backend")
+        return storage.SQLiteBackend(
+            storage.sqlite_path_from_url(url),
+            busy_timeout_ms=_env_number('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        )
+    return MySQLBackend(replica_urls)
+
+def get_backend():
+    """프로세스 공용 저장소 백엔드 (처음 호출 시 생성)"""
+    global _backend
+    backend = _backend
+    if backend is not None:
+        return backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+            log.info("Storage backend: %s", _backend.name)
+        return _backend
+
+def connection(read=False):
+    """현재 백엔드에서 (DB, cur)를 빌려주는 컨텍스트 매니저 (read=True: 복제본 사용 가능)"""
+    return get_backend().connection(read=read)
+
+def read_target():
+    """현재 요청의 읽기가 향할 곳 ('primary' / 'replica')"""
+    return get_backend().read_target()
+
+def reset_connection():
+    """연결 초기화 (재연결 필요할 때) - 열린 연결을 닫고 다음 사용 시 새로 생성
+
+    스키마/마이그레이션은 프로세스당 한 번만 실행되므로 다시 돌리지 않음
+    """
+    backend = _backend
+    if backend is not None:
+        backend.reset()
+
+def _index_exists(cur, table, index):
+    cur.execute(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+        (table, index),
+    )
+    return cur.fetchone() is not None
+
+def _m001_memos_listing_index(cur):
+    """get_memos의 WHERE username ... ORDER BY created_at, id 를 filesort 없이 처리"""
+    if not _index_exists(cur, 'memos', 'idx_memos_user_created'):
+        cur.execute("CREATE INDEX idx_memos_user_created ON memos (username, created_at, id)")
+
+def _m002_drop_memos_username_index(cur):
+    """(username) 단일 인덱스는 idx_memos_user_created의 접두사라 중복
+
+    InnoDB 보조 인덱스에는 PK(id)가 붙어 있으므로 delete_memo의
+    id + username 소유자 확인은 PK와 idx_memos_user_created로 처리됨
+    """
+    if _index_exists(cur, 'memos', 'idx_memos_username'):
+        cur.execute("DROP INDEX idx_memos_username ON memos")
+
+def _m003_memos_fulltext_index(cur):
+    """제목/본문 FULLTEXT 인덱스 (한국어 검색을 위해 ngram 파서 사용)
+
+    ngram 파서가 없는 서버(MariaDB 등)에서는 건너뛰고 메모리 역색인으로 검색
+    """
+    if _index_exists(cur, 'memos', 'ft_memos_title_content'):
+        return
+    try:
+        cur.execute(
+            "CREATE FULLTEXT INDEX ft_memos_title_content "
+            "ON memos (title, content) WITH PARSER ngram"
+        )
+    except (pymysql.err.ProgrammingError, pymysql.err.InternalError,
+            pymysql.err.OperationalError) as e:
+        log.warning("FULLTEXT ngram index unavailable, using in-memory search: %s", e)
+
+def _m004_widen_password_hash(cur):
+    """scrypt 해시 문자열(파라미터+솔트 포함)을 담도록 password_hash 확장"""
+    cur.execute(
+        "SELECT CHARACTER_MAXIMUM_LENGTH FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = 'users' AND column_name = 'password_hash'"
+    )
+    row = cur.fetchone()
+    if row and row[0] is not None and row[0] < 255:
+        cur.execute("ALTER TABLE users MODIFY password_hash VARCHAR(255) NOT NULL")
+
+def _m005_memos_preview(cur):
+    """목록용 preview/content_length 컬럼 - 목록 쿼리가 content(TEXT) 페이지를 읽지 않도록
+
+    기존 메모는 id 순서로 나눠서 채움 (storage.backfill_previews)
+    """
+    cur.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = 'memos' "
+        "AND column_name IN ('preview', 'content_length')"
+    )
+    existing = {row[0].lower() for row in cur.fetchall()}
+    if 'preview' not in existing:
+        cur.execute("ALTER TABLE memos ADD COLUMN preview VARCHAR(255) NULL")
+    if 'content_length' not in existing:
+        cur.execute("ALTER TABLE memos ADD COLUMN content_length INT NULL")
+    storage.backfill_previews(cur)
+
+def _column_exists(cur, table, column):
+    cur.execute(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1",
+        (table, column),
+    )
+    return cur.fetchone() is not None
+
+def _backfill_memo_user_ids(cur, batch_size=5000):
+    """memos.user_id를 users.id로 채움 - id 범위 단위 UPDATE + 커밋으로 잠금을 짧게 유지"""
+    cur.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM memos WHERE user_id IS NULL")
+    low, high = cur.fetchone()
+    total = 0
+    while low and low <= high:
+        total += cur.execute(
+            "UPDATE memos m JOIN users u ON u.username = m.username SET m.user_id = u.id "
+            "WHERE m.id >= %s AND m.id < %s AND m.user_id IS NULL",
+            (low, low + batch_size),
+        )
+        cur.connection.commit()
+        low += batch_size
+    if total:
+        log.info("Backfilled user_id for %d memos", total)
+
+def _m006_memos_user_id(cur):
+    """memos.user_id (users.id 참조, ON DELETE CASCADE) 추가 후 기존 행 채우기
+
+    컬럼/인덱스는 온라인 DDL(LOCK=NONE), 외래키는 채우기가 끝난 뒤 INPLACE로 추가
+    사용자가 없는 고아 메모는 user_id가 NULL로 남아 조회되지 않음
+    """
+    if not _column_exists(cur, 'memos', 'user_id'):
+        # MySQL 8은 INSTANT로 처리 (테이블 재작성 없음)
+        cur.execute("ALTER TABLE memos ADD COLUMN user_id INT NULL")
+    _backfill_memo_user_ids(cur)
+    if not _index_exists(cur, 'memos', 'idx_memos_userid_created'):
+        cur.execute(
+            "CREATE INDEX idx_memos_userid_created ON memos (user_id, created_at, id) "
+            "ALGORITHM=INPLACE LOCK=NONE"
+        )
+    cur.execute(
+        "SELECT 1 FROM information_schema.table_constraints "
+        "WHERE table_schema = DATABASE() AND table_name = 'memos' "
+        "AND constraint_name = 'fk_memos_user' LIMIT 1"
+    )
+    if cur.fetchone() is None:
+        # 이미 채운 데이터라 검사를 끄고 INPLACE로 추가 (켜 두면 테이블 전체 복사)
+        cur.execute("SET foreign_key_checks = 0")
+        try:
+            cur.execute(
+                "ALTER TABLE memos ADD CONSTRAINT fk_memos_user FOREIGN KEY (user_id) "
+                "REFERENCES users (id) ON DELETE CASCADE, ALGORITHM=INPLACE, LOCK=NONE"
+            )
+        finally:
+            cur.execute("SET foreign_key_checks = 1")
+
+def _m007_drop_memos_username(cur):
+    """username 컬럼과 (username, created_at, id) 인덱스 제거 - 행/인덱스 크기 감소
+
+    m006 이후 구버전 워커가 넣은 행이 있을 수 있으므로 한 번 더 채운 뒤 제거
+    컬럼 삭제는 알고리즘을 지정하지 않음 - FULLTEXT 인덱스(m003)가 있는 테이블은
+    INPLACE 재구성을 지원하지 않으므로 MySQL이 INSTANT(8.0.29+) 또는 COPY를 고르게 함
+    """
+    if not _column_exists(cur, 'memos', 'username'):
+        return
+    _backfill_memo_user_ids(cur)
+    if _index_exists(cur, 'memos', 'idx_memos_user_created'):
+        cur.execute("DROP INDEX idx_memos_user_created ON memos ALGORITHM=INPLACE LOCK=NONE")
+    cur.execute("ALTER TABLE memos DROP COLUMN username")
+
+def _m008_account_purges(cur):
+    """탈퇴 표시(users.deleted_at)와 백그라운드 메모 삭제 작업 테이블"""
+    if not _column_exists(cur, 'users', 'deleted_at'):
+        cur.execute("ALTER TABLE users ADD COLUMN deleted_at TIMESTAMP NULL")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS account_purges (
+            user_id INT PRIMARY KEY,
+            requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_memos INT NOT NULL DEFAULT 0,
+            lease_owner VARCHAR(64) NULL,
+            lease_until DOUBLE NOT NULL DEFAULT 0,
+            finished_at TIMESTAMP NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """
+    )
+
+def _m009_memo_changes(cur):
+    """사용자별 변경 순번(users.memo_seq)과 추가/삭제 변경 기록 테이블"""
+    if not _column_exists(cur, 'users', 'memo_seq'):
+        cur.execute("ALTER TABLE users ADD COLUMN memo_seq BIGINT NOT NULL DEFAULT 0")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memo_changes (
+            user_id INT NOT NULL,
+            seq BIGINT NOT NULL,
+            memo_id INT NOT NULL,
+            op CHAR(1) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, seq),
+            CONSTRAINT fk_memo_changes_user FOREIGN KEY (user_id)
+                REFERENCES users (id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """
+    )
+
+# (버전, 설명, 함수) - 버전 순서대로 한 번씩만 적용, 각 단계는 다시 실행해도 안전해야 함
+MIGRATIONS = [
+    (1, 'memos (username, created_at, id) index', _m001_memos_listing_index),
+    (2, 'drop redundant memos (username) index', _m002_drop_memos_username_index),
+    (3, 'memos (title, content) FULLTEXT ngram index', _m003_memos_fulltext_index),
+    (4, 'widen users.password_hash for scrypt', _m004_widen_password_hash),
+    (5, 'memos preview/content_length columns', _m005_memos_preview),
+    (6, 'memos.user_id foreign key to users.id', _m006_memos_user_id),
+    (7, 'drop memos.username', _m007_drop_memos_username),
+    (8, 'users.deleted_at and account_purges queue', _m008_account_purges),
+    (9, 'users.memo_seq and memo_changes log', _m009_memo_changes),
+]
+
+MIGRATION_LOCK_NAME = 'memo_app_schema_migrations'
+# 다른 워커가 큰 테이블을 마이그레이션하는 동안 기다릴 시간(초)
+MIGRATION_LOCK_TIMEOUT = _env_number('DB_MIGRATION_LOCK_TIMEOUT', 600)
+
+def run_migrations(DB, cur):
+    """schema_version 테이블 기준으로 아직 적용 안 된 마이그레이션 실행"""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """
+    )
+    # 여러 워커가 동시에 뜰 때 한 프로세스만 마이그레이션하도록 잠금
+    cur.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+    locked = cur.fetchone()
+    if not locked or locked[0] != 1:
+        raise DBError("마이그레이션 잠금 획득 실패")
+    try:
+        cur.execute("SELECT version FROM schema_version")
+        applied = {row[0] for row in cur.fetchall()}
+        for version, description, step in MIGRATIONS:
+            if version in applied:
+                continue
+            log.info("Migration %s: %s", version, description)
+            step(cur)
+            cur.execute(
+                "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            DB.commit()
+            log.info("Migration %s applied", version)
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+        cur.fetchall()
+
+def ensure_schema(DB, cur):
     """필수 테이블/인덱스가 없으면 생성"""
-    global DB, cur
+    global fulltext_enabled
     try:
         # users 테이블
         cur.execute(
@@ -141,206 +917,872 @@ def ensure_schema():
             """
         )
         DB.commit()
-        print("[db] ✓ Schema ensured")
+        run_migrations(DB, cur)
+        fulltext_enabled = _index_exists(cur, 'memos', 'ft_memos_title_content')
+        log.info("Schema ensured")
     except Exception as e:
-        print(f"[db] ✗ Schema ensure error: {e}")
+        log.error("Schema ensure error: %s", e)
         try:
             DB.rollback()
         except Exception:
             pass
         raise DBError(f"스키마 생성 실패: {str(e)}")
 
-def get_connection():
-    """데이터베이스 연결 획득"""
-    global DB, cur, schema_initialized
-    if DB is None:
-        db_config = build_db_config()
-
-        # 디버그: 비밀번호는 마스킹해서 로그에 남김
-        masked = db_config.copy()
-        if 'password' in masked and masked['password']:
-            masked['password'] = '****'
-        print(f"[db] connecting with: {masked}")
-        
-        try:
-            # 연결 타임아웃 설정
-            DB = pymysql.connect(
-                host=db_config['host'],
-                user=db_config['user'],
-                password=db_config['password'],
-                database=db_config['database'],
-                port=db_config['port'],
-                charset='utf8mb4',
-                connect_timeout=30,
-                read_timeout=30,
-                write_timeout=30,
-                autocommit=False
-            )
-            cur = DB.cursor()
-            # 연결 확인
-            cur.execute("SELECT 1")
-            print("[db] ✓ Connection successful!")
-            if not schema_initialized:
-                ensure_schema()
-                schema_initialized = True
-        except pymysql.err.OperationalError as e:
-            print(f"[db] ✗ Operational error: {e}")
-            print(f"[db] Config: {masked}")
-            reset_connection()
-            raise DBError(f"데이터베이스 연결 실패: {str(e)}")
-        except pymysql.err.ProgrammingError as e:
-            print(f"[db] ✗ Programming error: {e}")
-            reset_connection()
-            raise DBError(f"SQL 오류: {str(e)}")
-        except Exception as e:
-            print(f"[db] ✗ Unexpected error: {type(e).__name__}: {e}")
-            reset_connection()
-            raise DBError(f"연결 오류: {str(e)}")
-    return DB, cur
-
-hash_password = lambda passwd: hl.sha256(passwd.encode()).hexdigest()
+hash_password = passwords.hash_password
 
+@metrics.timed_query
 def add_user(username, password):
     """사용자 추가"""
     if not username or not password:
         raise DBError("사용자명과 비밀번호는 필수입니다")
     
-    password_hash = hash_password(password)
     try:
-        DB, cur = get_connection()
-        query = "INSERT INTO users (username, password_hash) VALUES (%s, %s)"
-        cur.execute(query, (username, password_hash))
-        DB.commit()
-        print(f"[db] ✓ User added: {username}")
-    except pymysql.err.IntegrityError:
-        print(f"[db] ! User already exists: {username}")
+        password_hash = hash_password(password)
+    except passwords.PasswordHasherBusy as e:
+        log.warning("Password hasher busy: %s", username)
+        raise DBError(f"{e} 잠시 후 다시 시도하세요")
+    try:
+        with connection() as (DB, cur):
+            query = "INSERT INTO users (username, password_hash) VALUES (%s, %s)"
+            cur.execute(query, (username, password_hash))
+            user_id = cur.lastrowid
+            DB.commit()
+            _users.set(username, (user_id, password_hash))
+            applog.success(log, "User added: %s", username)
+        return user_id
+    except IntegrityError:
+        log.warning("User already exists: %s", username)
+        _users.delete(username)
         raise DBError("이미 존재하는 사용자명입니다")
-    except pymysql.err.OperationalError as e:
-        print(f"[db] ✗ Operational error: {e}")
-        reset_connection()
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
         raise DBError("데이터베이스 연결 오류")
     except Exception as e:
-        print(f"[db] ✗ Add user error: {e}")
+        log.error("Add user error: %s", e)
         raise DBError(f"사용자 추가 실패: {str(e)}")
 
+def _lookup_user(username, fresh=False):
+    """(id, password_hash) 또는 None - 캐시를 먼저 보고 없으면 조회 (DB 오류는 그대로 올려보냄)
+
+    fresh=True면 캐시를 건너뛰고 DB에서 조회 (다른 워커의 탈퇴도 바로 반영)
+    """
+    if not fresh:
+        cached = _users.get(username)
+        if cached is not cache.MISS:
+            return cached
+    with connection(read=True) as (DB, cur):
+        cur.execute(
+            "SELECT id, password_hash FROM users WHERE username = %s AND deleted_at IS NULL",
+            (username,),
+        )
+        row = cur.fetchone()
+    if row is None:
+        _users.set(username, None, ttl=USER_CACHE_NEGATIVE_TTL)
+        return None
+    user = (row[0], row[1])
+    _users.set(username, user)
+    return user
+
+def invalidate_user(username):
+    """사용자 조회 캐시에서 제거"""
+    if username:
+        _users.delete(username)
+
+@metrics.timed_query
+def get_user_id(username, fresh=False):
+    """사용자 id (없거나 조회 실패 시 None) - 세션에 저장해 두고 사용
+
+    로그인 처리처럼 탈퇴 여부가 중요하면 fresh=True (캐시 없이 조회)
+    """
+    if not username:
+        return None
+    try:
+        user = _lookup_user(username, fresh=fresh)
+    except Exception as e:
+        log.error("Get user id error: %s", e)
+        return None
+    return user[0] if user else None
+
+@metrics.timed_query
 def verify_user(username, password):
-    """사용자 인증"""
+    """사용자 인증
+
+    저장된 해시가 레거시(SHA-256)이거나 비용 파라미터가 바뀌었으면 로그인 성공 시 다시 해시해서 저장
+    해시 계산 슬롯이 없으면 passwords.PasswordHasherBusy를 그대로 올려보냄
+    """
     if not username or not password:
         return False
-    
-    password_hash = hash_password(password)
+
     try:
-        DB, cur = get_connection()
-        query = "SELECT username, password_hash FROM users WHERE username = %s"
-        cur.execute(query, (username,))
-        result = cur.fetchone()
-        
-        if result and result[1] == password_hash:
-            print(f"[db] ✓ User verified: {username}")
-            return True
-        print(f"[db] ! Invalid credentials: {username}")
-        return False
-    except pymysql.err.OperationalError as e:
-        print(f"[db] ✗ Operational error: {e}")
-        reset_connection()
+        # 느린 해시 계산 동안 커넥션을 붙잡지 않도록 조회만 하고 바로 반납
+        # 다른 워커에서 탈퇴한 계정이 캐시로 로그인하지 않도록 캐시 없이 조회
+        result = _lookup_user(username, fresh=True)
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
         return False
     except Exception as e:
-        print(f"[db] ✗ Verify error: {e}")
+        log.error("Verify error: %s", e)
         return False
 
-def add_memo(title, content, username):
-    """메모 추가"""
-    if not title or not content or not username:
-        raise DBError("제목, 내용, 사용자명은 필수입니다")
+    if not result or not passwords.verify_password(password, result[1]):
+        log.warning("Invalid credentials: %s", username)
+        return False
+
+    applog.success(log, "User verified: %s", username)
+    if passwords.needs_rehash(result[1]):
+        _rehash_password(username, password, result[1])
+    return True
+
+def _rehash_password(username, password, old_hash):
+    """현재 설정으로 비밀번호 해시 갱신 (실패해도 로그인에는 영향 없음)"""
+    try:
+        new_hash = hash_password(password)
+        with connection() as (DB, cur):
+            # 다른 요청이 먼저 갱신했으면 덮어쓰지 않음
+            cur.execute(
+                "UPDATE users SET password_hash = %s WHERE username = %s AND password_hash = %s",
+                (new_hash, username, old_hash),
+            )
+            DB.commit()
+        invalidate_user(username)
+        log.info("Password hash upgraded: %s", username)
+    except Exception as e:
+        log.warning("Password rehash failed for %s: %s", username, e)
+
+_MEMO_INSERT = (
+    "INSERT INTO memos (title, content, user_id, preview, content_length) "
+    "VALUES (%s, %s, %s, %s, %s)"
+)
+
+def _reserve_change_seqs(cur, user_id, count):
+    """users.memo_seq를 count만큼 올리고 할당된 첫 순번 반환
+
+    메모 INSERT/DELETE보다 먼저 실행해서 users 행을 배타 잠금 - 같은 사용자의 쓰기가
+    순번 순서대로 커밋되고, FK 검사의 공유 잠금 뒤에 배타 잠금을 잡는 교착도 생기지 않음
+    """
+    cur.execute("UPDATE users SET memo_seq = memo_seq + %s WHERE id = %s AND deleted_at IS NULL",
+                (count, user_id))
+    cur.execute("SELECT memo_seq FROM users WHERE id = %s AND deleted_at IS NULL", (user_id,))
+    row = cur.fetchone()
+    if row is None:
+        # 없거나 탈퇴한 사용자 (다른 워커의 사용자 캐시에 남아 있어도 쓰기는 막힘)
+        raise DBError("사용자를 찾을 수 없습니다")
+    return row[0] - count + 1
+
+def _log_changes(cur, user_id, first_seq, op, memo_ids):
+    """변경 기록 추가 (op: 'i' 추가, 'd' 삭제) 후 보관 개수를 넘는 오래된 기록 정리"""
+    cur.executemany(
+        "INSERT INTO memo_changes (user_id, seq, memo_id, op) VALUES (%s, %s, %s, %s)",
+        [(user_id, first_seq + i, memo_id, op) for i, memo_id in enumerate(memo_ids)],
+    )
+    last_seq = first_seq + len(memo_ids) - 1
+    if MEMO_CHANGES_RETENTION:
+        cur.execute("DELETE FROM memo_changes WHERE user_id = %s AND seq <= %s",
+                    (user_id, last_seq - MEMO_CHANGES_RETENTION))
+    return last_seq
+
+def _insert_memo(cur, params):
+    """메모 하나 추가 + 변경 기록 (params: _import_params 결과) - 반환: (새 메모 id, 순번)"""
+    user_id = params[2]
+    seq = _reserve_change_seqs(cur, user_id, 1)
+    cur.execute(_MEMO_INSERT, params)
+    memo_id = cur.lastrowid
+    _log_changes(cur, user_id, seq, 'i', [memo_id])
+    return memo_id, seq
+
+def _notify_change(user_id, seq, op, memo_id=None):
+    """커밋된 변경을 /api/memos/stream 구독자에게 알림 (op: 'insert' | 'delete')"""
+    events.publish(user_id, {'seq': seq, 'op': op, 'id': memo_id})
+
+@metrics.timed_query
+def add_memo(title, content, user_id):
+    """메모 추가 (user_id: users.id) - 반환: 새 메모 id"""
+    if not title or not content or not user_id:
+        raise DBError("제목, 내용, 사용자 id는 필수입니다")
     
     try:
-        DB, cur = get_connection()
-        query = "INSERT INTO memos (title, content, username) VALUES (%s, %s, %s)"
-        cur.execute(query, (title[:255], content, username))
-        DB.commit()
-        print(f"[db] ✓ Memo added for user: {username}")
-    except pymysql.err.OperationalError as e:
-        print(f"[db] ✗ Operational error: {e}")
-        reset_connection()
+        with connection() as (DB, cur):
+            memo_id, seq = _insert_memo(cur, _import_params(title[:255], content, user_id))
+            DB.commit()
+            _notify_change(user_id, seq, 'insert', memo_id)
+            applog.success(log, "Memo added for user: %s", user_id)
+            return memo_id
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
         raise DBError("데이터베이스 연결 오류")
     except Exception as e:
-        print(f"[db] ✗ Add memo error: {e}")
+        log.error("Add memo error: %s", e)
         raise DBError(f"메모 추가 실패: {str(e)}")
 
-def get_memos(username):
-    """메모 조회"""
-    if not username:
-        return []
-    
+def _validate_import_row(item):
+    """가져오기 행 검사 - 정상이면 (title, content), 아니면 오류 메시지 문자열"""
+    if not isinstance(item, dict):
+        return "메모 형식이 올바르지 않습니다"
+    title = item.get('title')
+    content = item.get('content')
+    if not isinstance(title, str) or not isinstance(content, str) or not title or not content:
+        return "제목과 내용은 필수입니다"
+    return title[:255], content
+
+def _import_params(title, content, user_id):
+    return title, content, user_id, storage.make_preview(content), len(content)
+
+@metrics.timed_query
+def add_memos_bulk(user_id, memos, batch_size=500):
+    """메모 여러 개를 batch_size개씩 executemany로 추가
+
+    batch 하나가 트랜잭션 하나 - 실패한 batch는 행 단위로 다시 넣어서
+    문제 있는 행만 오류로 기록하고 나머지는 저장
+    반환: {'inserted': 저장된 수, 'errors': [{'index': 순번, 'error': 메시지}, ...]}
+    """
+    if not user_id:
+        raise DBError("사용자 id는 필수입니다")
+    batch_size = max(1, int(batch_size))
+
+    inserted = 0
+    last_seq = None
+    errors = []
+
+    def flush(DB, cur, batch):
+        nonlocal inserted, last_seq
+        if not batch:
+            return
+        try:
+            first_seq = _reserve_change_seqs(cur, user_id, len(batch))
+            # users 행을 잠갔으므로 이 사용자의 다른 메모 추가와 섞이지 않음
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM memos WHERE user_id = %s", (user_id,))
+            last_id = cur.fetchone()[0]
+            cur.executemany(_MEMO_INSERT, [_import_params(title, content, user_id)
+                                           for _, title, content in batch])
+            cur.execute("SELECT id FROM memos WHERE user_id = %s AND id > %s ORDER BY id",
+                        (user_id, last_id))
+            seq = _log_changes(cur, user_id, first_seq, 'i', [row[0] for row in cur.fetchall()])
+            DB.commit()
+            inserted += len(batch)
+            last_seq = seq
+            return
+        except OperationalError:
+            raise
+        except Exception:
+            DB.rollback()
+        # batch 실패 - 행 단위로 재시도해서 문제 행만 걸러냄
+        for index, title, content in batch:
+            try:
+                _, seq = _insert_memo(cur, _import_params(title, content, user_id))
+                DB.commit()
+                inserted += 1
+                last_seq = seq
+            except OperationalError:
+                raise
+            except Exception as e:
+                DB.rollback()
+                errors.append({'index': index, 'error': str(e)})
+
     try:
-        DB, cur = get_connection()
-        query = "SELECT id, title, content FROM memos WHERE username = %s ORDER BY created_at DESC"
-        cur.execute(query, (username,))
-        results = cur.fetchall()
-        print(f"[db] ✓ Got {len(results) if results else 0} memos for user: {username}")
-        return results if results else []
-    except pymysql.err.OperationalError as e:
-        print(f"[db] ✗ Operational error: {e}")
-        reset_connection()
-        return []
+        with connection() as (DB, cur):
+            batch = []
+            for index, item in enumerate(memos):
+                row = _validate_import_row(item)
+                if isinstance(row, str):
+                    errors.append({'index': index, 'error': row})
+                    continue
+                batch.append((index,) + row)
+                if len(batch) >= batch_size:
+                    flush(DB, cur, batch)
+                    batch = []
+            flush(DB, cur, batch)
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
+        raise DBError(f"데이터베이스 연결 오류 ({inserted}개 저장 후 중단)")
+    finally:
+        if inserted:
+            # 메모마다 보내지 않고 가져오기 전체에 한 번만 알림
+            _notify_change(user_id, last_seq, 'insert')
+
+    log.info("Imported %d memos for user: %s (%d errors)", inserted, user_id, len(errors))
+    metrics.record_rows(inserted)
+    errors.sort(key=lambda error: error['index'])
+    return {'inserted': inserted, 'errors': errors}
+
+def encode_cursor(created_at, memo_id):
+    """(created_at, id)를 클라이언트에 넘길 불투명 커서 문자열로 변환"""
+    raw = json.dumps([str(created_at), int(memo_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """encode_cursor로 만든 커서를 (created_at, id)로 복원"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, memo_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(created_at), int(memo_id)
+    except Exception:
+        raise DBError("잘못된 커서입니다")
+
+def next_cursor(rows, limit):
+    """페이지가 가득 찼으면 마지막 행 기준 다음 커서, 아니면 None"""
+    if not limit or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last[3], last[0])
+
+def _memo_seq(cur, user_id):
+    """사용자의 현재 변경 순번 (없거나 탈퇴한 사용자면 None)
+
+    메모 추가/삭제와 같은 트랜잭션에서 올라가므로 모든 워커가 같은 값을 봄
+    캐시 키에 넣어서 다른 워커의 쓰기도 바로 반영되게 함 (PK 조회 한 번)
+    같은 순번이면 primary/복제본 어디서 읽어도 결과가 같으므로 읽기 대상은 키에 넣지 않음
+    탈퇴 표시도 여기서 확인하므로 탈퇴한 계정은 다른 워커에서도 바로 메모를 읽을 수 없음
+    """
+    cur.execute("SELECT memo_seq FROM users WHERE id = %s AND deleted_at IS NULL", (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def cache_stats():
+    """메모 캐시 적중/실패 통계"""
+    return memo_cache.stats()
+
+# get_memo_summaries/get_memo_summary_page 공통 컬럼
+MEMO_SUMMARY_COLUMNS = "id, title, COALESCE(preview, ''), created_at, COALESCE(content_length, 0)"
+
+def _list_memos(kind, columns, user_id, limit, cursor, seq=None):
+    """get_memos/get_memo_summaries 공통 - 최신순 키셋 페이지 조회 + 캐시
+
+    columns의 네 번째 값은 created_at이어야 함 (next_cursor가 row[3]을 사용)
+    반환: (결과가 반영한 순번, 행 목록) - 없거나 탈퇴한 사용자, 조회 실패 시 (None, [])
+    seq를 넘기면 그 순번 키로 캐시를 먼저 확인해서 적중 시 DB를 읽지 않음
+    """
+    if not user_id:
+        return None, []
+
+    query = f"SELECT {columns} FROM memos WHERE user_id = %s"
+    params = [user_id]
+    if cursor:
+        created_at, memo_id = decode_cursor(cursor)
+        query += " AND (created_at < %s OR (created_at = %s AND id < %s))"
+        params += [created_at, created_at, memo_id]
+    query += " ORDER BY created_at DESC, id DESC"
+    if limit:
+        query += " LIMIT %s"
+        params.append(int(limit))
+
+    if seq is not None:
+        cached = memo_cache.get(f"{kind}:{user_id}:{seq}:{limit}:{cursor}")
+        if cached is not cache.MISS:
+            metrics.record_rows(len(cached))
+            return seq, list(cached)
+
+    try:
+        with connection(read=True) as (DB, cur):
+            # 넘겨받은 순번 이후 쓰기가 있었을 수 있으므로 같은 연결에서 다시 읽음
+            seq = _memo_seq(cur, user_id)
+            if seq is None:
+                return None, []
+            # 순번과 목록을 같은 연결(스냅샷)에서 읽으므로 키의 순번 = 결과가 반영한 순번
+            # 뒤처진 복제본의 결과는 예전 순번 키에만 들어가서 최신 순번을 본 요청에는 쓰이지 않음
+            cache_key = f"{kind}:{user_id}:{seq}:{limit}:{cursor}"
+            cached = memo_cache.get(cache_key)
+            if cached is not cache.MISS:
+                metrics.record_rows(len(cached))
+                return seq, list(cached)
+            cur.execute(query, params)
+            results = list(cur.fetchall() or [])
+            applog.success(log, "Got %d memos for user: %s", len(results), user_id)
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
+        return None, []
+    except Exception as e:
+        log.error("Get memos error: %s", e)
+        return None, []
+    memo_cache.set(cache_key, results)
+    metrics.record_rows(len(results))
+    return seq, list(results)
+
+@metrics.timed_query
+def get_memos(user_id, limit=None, cursor=None):
+    """메모 조회 (최신순, created_at/id 기준 키셋 페이지네이션)
+
+    반환 행: (id, title, content, created_at)
+    limit이 없으면 전체, cursor가 있으면 해당 위치 다음부터 조회
+    """
+    return _list_memos('memos', "id, title, content, created_at", user_id, limit, cursor)[1]
+
+@metrics.timed_query
+def get_memo_summaries(user_id, limit=None, cursor=None):
+    """메모 목록 요약 조회 - 본문(content) 대신 저장된 미리보기와 길이만 읽음
+
+    반환 행: (id, title, preview, created_at, content_length)
+    페이지네이션/커서는 get_memos와 같음, 전체 본문은 get_memo로 조회
+    """
+    return _list_memos('memo-summaries', MEMO_SUMMARY_COLUMNS, user_id, limit, cursor)[1]
+
+@metrics.timed_query
+def get_memo_summary_page(user_id, limit=None, cursor=None, seq=None):
+    """get_memo_summaries + 결과가 반영한 변경 순번 - (seq, rows)
+
+    ETag용으로 먼저 읽은 순번을 seq로 넘기면 캐시 적중 시 순번을 다시 읽지 않음
+    그 사이 쓰기가 있었으면 새 순번과 그 순번의 목록을 돌려줌 (ETag는 반환된 순번으로 계산)
+    """
+    return _list_memos('memo-summaries', MEMO_SUMMARY_COLUMNS, user_id, limit, cursor, seq)
+
+@metrics.timed_query
+def get_memo(memo_id, user_id):
+    """메모 하나 전체 조회 (본인 메모만) - 반환: (id, title, content, created_at) 또는 None"""
+    if not memo_id or not user_id:
+        return None
+
+    try:
+        with connection(read=True) as (DB, cur):
+            seq = _memo_seq(cur, user_id)
+            if seq is None:
+                return None
+            cache_key = f"memo:{user_id}:{seq}:{memo_id}"
+            cached = memo_cache.get(cache_key)
+            if cached is not cache.MISS:
+                return cached
+            cur.execute(
+                "SELECT id, title, content, created_at FROM memos WHERE id = %s AND user_id = %s",
+                (memo_id, user_id),
+            )
+            row = cur.fetchone()
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
+        raise DBError("데이터베이스 연결 오류")
+    except Exception as e:
+        log.error("Get memo error: %s", e)
+        raise DBError(f"메모 조회 실패: {str(e)}")
+    row = tuple(row) if row else None
+    memo_cache.set(cache_key, row)
+    return row
+
+@metrics.timed_query
+def get_memos_version(user_id):
+    """메모 목록 버전 문자열 (변경 순번) - ETag 계산용
+
+    메모가 추가/삭제될 때마다 올라가므로 따로 개수를 세지 않음 (users PK 조회 한 번)
+    조회 실패 시 None
+    """
+    seq = get_memo_seq(user_id)
+    return None if seq is None else str(seq)
+
+@metrics.timed_query
+def get_memo_seq(user_id):
+    """사용자의 현재 변경 순번 (/api/memos/changes?since= 시작값) - 조회 실패 시 None"""
+    if not user_id:
+        return None
+
+    try:
+        with connection(read=True) as (DB, cur):
+            return _memo_seq(cur, user_id)
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
+        return None
+    except Exception as e:
+        log.error("Get memo seq error: %s", e)
+        return None
+
+@metrics.timed_query
+def get_memo_changes(user_id, since, limit=500):
+    """since 순번 이후의 메모 추가/삭제 기록 (오래된 순)
+
+    반환: {'seq': 현재 순번, 'reset': since가 보관 범위 밖이라 목록 전체를 다시 받아야 하는지,
+           'more': limit 때문에 잘렸는지,
+           'changes': [(seq, op, memo_id, title, preview, created_at, content_length), ...]}
+    추가 기록의 메모가 이미 삭제됐으면 뒤에 삭제 기록이 있으므로 추가 기록은 뺌
+    결과는 현재 순번 단위로 캐시 - 변경이 없는 동안 반복 요청은 기록 테이블을 읽지 않음
+    """
+    if not user_id:
+        return None
+    since = max(int(since), 0)
+    limit = max(int(limit), 1)
+
+    try:
+        with connection(read=True) as (DB, cur):
+            seq = _memo_seq(cur, user_id)
+            if seq is None:
+                return None
+            cache_key = f"changes:{user_id}:{seq}:{since}:{limit}"
+            cached = memo_cache.get(cache_key)
+            if cached is not cache.MISS:
+                return cached
+            result = {'seq': seq, 'reset': False, 'more': False, 'changes': []}
+            oldest = seq - MEMO_CHANGES_RETENTION if MEMO_CHANGES_RETENTION else 0
+            if since > seq or since < oldest:
+                result['reset'] = True
+            elif since < seq:
+                cur.execute(
+                    "SELECT c.seq, c.op, c.memo_id, m.title, m.preview, m.created_at, m.content_length "
+                    "FROM memo_changes c LEFT JOIN memos m ON c.op = 'i' AND m.id = c.memo_id "
+                    "WHERE c.user_id = %s AND c.seq > %s ORDER BY c.seq LIMIT %s",
+                    (user_id, since, limit + 1),
+                )
+                rows = [tuple(r) for r in cur.fetchall()]
+                result['more'] = len(rows) > limit
+                rows = rows[:limit]
+                if rows:
+                    # 잘린 경우 클라이언트는 마지막 기록 순번부터 이어서 요청
+                    result['seq'] = rows[-1][0]
+                result['changes'] = [r for r in rows if r[1] == 'd' or r[3] is not None]
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
+        raise DBError("데이터베이스 연결 오류")
     except Exception as e:
-        print(f"[db] ✗ Get memos error: {e}")
-        return []
+        log.error("Get memo changes error: %s", e)
+        raise DBError(f"변경 기록 조회 실패: {str(e)}")
+    memo_cache.set(cache_key, result)
+    metrics.record_rows(len(result['changes']))
+    return result
 
-def delete_memo(memo_id):
-    """메모 삭제"""
+@metrics.timed_query
+def iter_memo_chunks(user_id, chunk_size=500):
+    """메모 전체를 스트리밍 커서(MySQL은 SSCursor)로 chunk_size개씩 나눠서 반환
+
+    결과를 한 번에 메모리에 올리지 않으므로 메모 수와 상관없이 메모리 사용량이 일정함
+    각 chunk는 (id, title, content, created_at) 행의 리스트
+    """
+    if not user_id:
+        return
+
+    query = (
+        "SELECT id, title, content, created_at FROM memos "
+        "WHERE user_id = %s ORDER BY created_at DESC, id DESC"
+    )
+    try:
+        with connection(read=True) as (DB, check):
+            if _memo_seq(check, user_id) is None:
+                return
+            cur = get_backend().stream_cursor(DB)
+            cur.execute(query, (user_id,))
+            total = 0
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                total += len(rows)
+                yield rows
+            cur.close()
+            metrics.record_rows(total)
+            log.info("Exported %d memos for user: %s", total, user_id)
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
+        raise DBError("데이터베이스 연결 오류")
+
+def _encode_offset(offset):
+    raw = json.dumps({'o': int(offset)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_offset(cursor):
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode()))['o'])
+    except Exception:
+        raise DBError("잘못된 커서입니다")
+    if offset < 0:
+        raise DBError("잘못된 커서입니다")
+    return offset
+
+class _SearchIndexEntry:
+    """사용자 하나의 역색인 + 반영한 변경 순번 (lock: 같은 색인을 동시에 갱신하지 않도록)"""
+
+    def __init__(self):
+        self.seq = None
+        self.index = None
+        self.lock = threading.Lock()
+
+def _search_index_entry(user_id):
+    with _search_indexes_lock:
+        entry = _search_indexes.get(user_id)
+        if entry is cache.MISS:
+            entry = _SearchIndexEntry()
+            _search_indexes.set(user_id, entry)
+        return entry
+
+def _replay_changes(index, user_id, since, seq):
+    """since 이후 seq까지의 변경 기록을 색인에 반영 - 기록이 보관 범위 밖이라 빠졌으면 False
+
+    추가 후 삭제된 메모는 LEFT JOIN 결과가 NULL이라 건너뜀 (뒤따르는 삭제 기록으로 정리)
+    """
+    with connection(read=True) as (DB, cur):
+        cur.execute(
+            "SELECT c.seq, c.op, c.memo_id, m.title, m.content, m.created_at "
+            "FROM memo_changes c LEFT JOIN memos m ON c.op = 'i' AND m.id = c.memo_id "
+            "WHERE c.user_id = %s AND c.seq > %s AND c.seq <= %s ORDER BY c.seq",
+            (user_id, since, seq),
+        )
+        rows = cur.fetchall()
+    if len(rows) != seq - since:
+        return False
+    for _, op, memo_id, title, content, created_at in rows:
+        if op == 'd':
+            index.remove(memo_id)
+        elif title is not None:
+            index.add((memo_id, title, content, created_at))
+    metrics.record_rows(len(rows))
+    return True
+
+def _fallback_index(user_id):
+    """사용자 메모 역색인 (없거나 탈퇴한 사용자면 None)
+
+    처음에는 메모 전체로 만들고, 이후에는 색인이 반영한 순번 이후의 변경 기록만 추가/삭제
+    색인에 순번보다 새 내용이 들어 있어도 add/remove가 멱등이라 다시 반영해도 같음
+    """
+    seq = get_memo_seq(user_id)
+    if seq is None:
+        return None
+    entry = _search_index_entry(user_id)
+    with entry.lock:
+        if entry.index is not None and entry.seq == seq:
+            return entry.index
+        if (entry.index is not None and entry.seq < seq <= entry.seq + SEARCH_INDEX_REPLAY_MAX
+                and _replay_changes(entry.index, user_id, entry.seq, seq)):
+            entry.seq = seq
+            return entry.index
+        index = search.NgramIndex()
+        for chunk in iter_memo_chunks(user_id):
+            for row in chunk:
+                index.add(row)
+        entry.seq, entry.index = seq, index
+        return index
+
+@metrics.timed_query
+def search_memos(user_id, query, limit=20, cursor=None):
+    """메모 제목/본문 검색 (관련도 순, 오프셋 커서 페이지네이션)
+
+    반환: ([(id, title, content, score), ...], next_cursor)
+    MySQL FULLTEXT(ngram) 인덱스가 있으면 사용하고, 없으면(SQLite 포함) 메모리 역색인 사용
+    """
+    query = (query or '').strip()
+    if not user_id or not query:
+        return [], None
+    offset = _decode_offset(cursor)
+    limit = max(1, int(limit))
+
+    try:
+        if fulltext_enabled:
+            sql = (
+                "SELECT id, title, content, "
+                "MATCH(title, content) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score "
+                "FROM memos WHERE user_id = %s "
+                "AND MATCH(title, content) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+                "ORDER BY score DESC, id DESC LIMIT %s OFFSET %s"
+            )
+            with connection(read=True) as (DB, cur):
+                if _memo_seq(cur, user_id) is None:
+                    return [], None
+                cur.execute(sql, (query, user_id, query, limit, offset))
+                rows = [(r[0], r[1], r[2], float(r[3])) for r in cur.fetchall()]
+        else:
+            index = _fallback_index(user_id)
+            if index is None:
+                return [], None
+            rows = [(row[0], row[1], row[2], score)
+                    for row, score in index.search(query, limit, offset)]
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
+        raise DBError("데이터베이스 연결 오류")
+    except DBError:
+        raise
+    except Exception as e:
+        log.error("Search memos error: %s", e)
+        raise DBError(f"메모 검색 실패: {str(e)}")
+
+    metrics.record_rows(len(rows))
+    applog.success(log, "Search found %d memos for user: %s", len(rows), user_id)
+    next_page = _encode_offset(offset + len(rows)) if len(rows) == limit else None
+    return rows, next_page
+
+@metrics.timed_query
+def delete_memo(memo_id, user_id=None):
+    """메모 삭제 (user_id를 주면 본인 메모만 삭제)"""
     if not memo_id:
         raise DBError("메모 ID는 필수입니다")
     
     try:
-        DB, cur = get_connection()
-        query = "DELETE FROM memos WHERE id = %s"
-        cur.execute(query, (memo_id,))
-        DB.commit()
-        print(f"[db] ✓ Memo deleted: {memo_id}")
-    except pymysql.err.OperationalError as e:
-        print(f"[db] ✗ Operational error: {e}")
-        reset_connection()
+        with connection() as (DB, cur):
+            if not user_id:
+                # 변경 기록/캐시 무효화를 위해 소유자를 먼저 확인
+                cur.execute("SELECT user_id FROM memos WHERE id = %s", (memo_id,))
+                row = cur.fetchone()
+                if row is None:
+                    return
+                user_id = row[0]
+            seq = _reserve_change_seqs(cur, user_id, 1)
+            cur.execute("DELETE FROM memos WHERE id = %s AND user_id = %s", (memo_id, user_id))
+            if cur.rowcount != 1:
+                # 없는 메모 - 올린 순번도 되돌림
+                DB.rollback()
+                return
+            _log_changes(cur, user_id, seq, 'd', [memo_id])
+            DB.commit()
+            _notify_change(user_id, seq, 'delete', memo_id)
+            applog.success(log, "Memo deleted: %s", memo_id)
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
         raise DBError("데이터베이스 연결 오류")
     except Exception as e:
-        print(f"[db] ✗ Delete memo error: {e}")
+        log.error("Delete memo error: %s", e)
         raise DBError(f"메모 삭제 실패: {str(e)}")
 
+@metrics.timed_query
 def delete_user(username):
-    """사용자 삭제 (연관 메모 포함)"""
+    """탈퇴 처리 - 바로 로그인/조회할 수 없게 표시하고 메모 삭제는 백그라운드 작업으로 넘김
+
+    메모가 많아도 짧은 트랜잭션 하나로 끝남, 실제 삭제는 purge.py 작업자가 나눠서 처리
+    반환: 삭제 예약된 사용자 id (없는 사용자면 None)
+    """
     if not username:
         raise DBError("사용자명은 필수입니다")
     
     try:
-        DB, cur = get_connection()
-        query1 = "DELETE FROM memos WHERE username = %s"
-        query2 = "DELETE FROM users WHERE username = %s"
-        
-        cur.execute(query1, (username,))
-        cur.execute(query2, (username,))
-        DB.commit()
-        print(f"[db] ✓ User deleted: {username}")
-    except pymysql.err.OperationalError as e:
-        print(f"[db] ✗ Operational error: {e}")
-        reset_connection()
+        with connection() as (DB, cur):
+            cur.execute(
+                "SELECT id FROM users WHERE username = %s AND deleted_at IS NULL", (username,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            user_id = row[0]
+            cur.execute("UPDATE users SET deleted_at = CURRENT_TIMESTAMP WHERE id = %s", (user_id,))
+            # 예전에 끝난 작업 기록이 같은 id로 남아 있을 수 있음 (AUTO_INCREMENT 재사용)
+            cur.execute("DELETE FROM account_purges WHERE user_id = %s", (user_id,))
+            cur.execute("INSERT INTO account_purges (user_id) VALUES (%s)", (user_id,))
+            DB.commit()
+        invalidate_user(username)
+        applog.success(log, "User deleted (purge queued): %s", username)
+        return user_id
+    except OperationalError as e:
+        log.error("Operational error: %s", e)
         raise DBError("데이터베이스 연결 오류")
     except Exception as e:
-        print(f"[db] ✗ Delete user error: {e}")
+        log.error("Delete user error: %s", e)
         raise DBError(f"사용자 삭제 실패: {str(e)}")
 
+def claim_account_purge(owner, lease_seconds):
+    """대기 중인 탈퇴 계정 하나를 lease_seconds 동안 점유 - 점유한 user_id 또는 None
+
+    점유 기간이 지난 작업(작업자가 죽은 경우)은 다른 작업자가 이어서 처리
+    """
+    now = time.time()
+    with connection() as (DB, cur):
+        cur.execute(
+            "SELECT user_id FROM account_purges WHERE finished_at IS NULL AND lease_until < %s "
+            "ORDER BY requested_at LIMIT 1",
+            (now,),
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        claimed = cur.execute(
+            "UPDATE account_purges SET lease_owner = %s, lease_until = %s "
+            "WHERE user_id = %s AND lease_until < %s AND finished_at IS NULL",
+            (owner, now + lease_seconds, row[0], now),
+        )
+        DB.commit()
+    return row[0] if claimed else None
+
+@metrics.timed_query
+def purge_account_batch(user_id, owner, batch_size, lease_seconds):
+    """메모를 최대 batch_size개 삭제하고 진행 상황 기록 (트랜잭션 하나)
+
+    반환: 삭제한 메모 수, 점유를 잃었으면 None
+    """
+    with connection() as (DB, cur):
+        cur.execute(
+            "SELECT id FROM memos WHERE user_id = %s ORDER BY id LIMIT %s", (user_id, batch_size))
+        ids = [row[0] for row in cur.fetchall()]
+        if ids:
+            placeholders = ', '.join(['%s'] * len(ids))
+            cur.execute(f"DELETE FROM memos WHERE id IN ({placeholders})", ids)
+        owned = cur.execute(
+            "UPDATE account_purges SET deleted_memos = deleted_memos + %s, lease_until = %s "
+            "WHERE user_id = %s AND lease_owner = %s",
+            (len(ids), time.time() + lease_seconds, user_id, owner),
+        )
+        if not owned:
+            DB.rollback()
+            return None
+        DB.commit()
+    metrics.record_rows(len(ids))
+    return len(ids)
+
+def finish_account_purge(user_id, owner):
+    """메모를 다 지운 뒤 사용자 행 삭제 + 작업 완료 표시"""
+    with connection() as (DB, cur):
+        cur.execute("DELETE FROM users WHERE id = %s AND deleted_at IS NOT NULL", (user_id,))
+        cur.execute(
+            "UPDATE account_purges SET finished_at = CURRENT_TIMESTAMP, lease_owner = NULL "
+            "WHERE user_id = %s AND lease_owner = %s",
+            (user_id, owner),
+        )
+        DB.commit()
+
+def account_purge_status(user_id=None):
+    """탈퇴 계정 삭제 진행 상황 (user_id가 없으면 끝나지 않은 작업 전체)
+
+    반환: [{'user_id', 'requested_at', 'deleted_memos', 'remaining_memos', 'finished_at', 'lease_owner'}, ...]
+    """
+    query = (
+        "SELECT p.user_id, p.requested_at, p.deleted_memos, "
+        "(SELECT COUNT(*) FROM memos m WHERE m.user_id = p.user_id), p.finished_at, p.lease_owner "
+        "FROM account_purges p "
+    )
+    if user_id is None:
+        query += "WHERE p.finished_at IS NULL ORDER BY p.requested_at"
+        params = ()
+    else:
+        query += "WHERE p.user_id = %s"
+        params = (user_id,)
+    with connection(read=True) as (DB, cur):
+        cur.execute(query, params)
+        rows = cur.fetchall()
+    return [{
+        'user_id': row[0],
+        'requested_at': str(row[1]),
+        'deleted_memos': row[2],
+        'remaining_memos': row[3],
+        'finished_at': str(row[4]) if row[4] else None,
+        'lease_owner': row[5],
+    } for row in rows]
+
+@metrics.timed_query
 def user_exists(username):
     """사용자 존재 여부 확인"""
     if not username:
         return False
     
     try:
-        DB, cur = get_connection()
-        query = "SELECT 1 FROM users WHERE username = %s LIMIT 1"
-        cur.execute(query, (username,))
-        return cur.fetchone() is not None
+        return _lookup_user(username) is not None
     except:
         return False
 
 def close_db():
     """데이터베이스 연결 종료"""
     reset_connection()
+
+def _pool_gauge():
+    backend = _backend
+    if backend is None:
+        return {}
+    return {(('state', state),): count for state, count in backend.stats().items()}
+
+def _cache_gauge(field):
+    return lambda: {(('cache', 'memos'),): cache_stats()[field],
+                    (('cache', 'users'),): _users.stats()[field]}
+
+def _search_index_gauge():
+    return {(): sum(len(entry.index) for entry in _search_indexes.values()
+                    if entry.index is not None)}
+
+def _replica_gauge():
+    backend = _backend
+    router = getattr(backend, 'replicas', None)
+    if not router:
+        return {}
+    return {(('replica', name),): int(up) for name, up in router.stats().items()}
+
+metrics.register_gauge('memo_db_pool_connections', _pool_gauge)
+metrics.register_gauge('memo_db_replica_up', _replica_gauge)
+metrics.register_gauge('memo_search_index_memos', _search_index_gauge)
+metrics.register_gauge('memo_cache_hits', _cache_gauge('hits'))
+metrics.register_gauge('memo_cache_misses', _cache_gauge('misses'))
+metrics.register_gauge('memo_cache_entries', _cache_gauge('size'))
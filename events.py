@@ -0,0 +1,290 @@
+"""메모 변경 알림 (Server-Sent Events용 pub/sub)
+
+db.py가 메모 추가/삭제를 커밋한 뒤 publish()하면 같은 사용자의 /api/memos/stream 구독자에게 전달
+이벤트는 "변경이 있다"는 신호일 뿐이고 실제 내용은 /api/memos/changes?since= 로 가져감
+그래서 느린 구독자의 이벤트를 버려도 다음 동기화 때 빠짐없이 따라잡음
+
+여러 워커에 퍼진 구독자에게 보내려면 EVENT_BROKER_URL 설정
+- (비움)                          이 프로세스 구독자에게만 전달 (다른 워커는 주기적 동기화로 반영)
+- unix:///tmp/memo-events         같은 호스트 워커끼리 Unix 데이터그램 소켓으로 전달
+"""
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import applog
+import metrics
+
+log = applog.get_logger('events')
+
+# 구독자별로 쌓아 둘 최대 이벤트 수 - 넘치면 버리고 resync 이벤트 하나로 대체
+EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', 64))
+# 이벤트가 없을 때 연결 유지를 위해 보내는 주석 줄 간격(초)
+EVENT_HEARTBEAT = float(os.getenv('EVENT_HEARTBEAT', 15))
+# 스트림 하나를 유지할 최대 시간(초) - 끝나면 브라우저가 자동으로 다시 연결
+EVENT_STREAM_MAX_SECONDS = float(os.getenv('EVENT_STREAM_MAX_SECONDS', 300))
+# 프로세스당 동시 스트림 수 (스트림마다 요청 스레드 하나를 점유)
+EVENT_MAX_STREAMS = int(os.getenv('EVENT_MAX_STREAMS', 32))
+# 워커의 요청 스레드 수 - WSGI는 THREADS(gunicorn --threads, start_server.sh가 export),
+# ASGI는 asgi.py가 ASGI_THREADS로 설정 (set_request_threads)
+_request_threads = int(os.getenv('THREADS', 1))
+EVENT_BROKER_URL = os.getenv('EVENT_BROKER_URL', '')
+
+# 브라우저 재연결 대기 시간(밀리초)
+_RETRY_MS = 3000
+
+class Subscription:
+    """구독자 하나의 크기 제한 큐"""
+
+    def __init__(self, user_id, maxsize=EVENT_QUEUE_SIZE):
+        self.user_id = user_id
+        self._maxsize = maxsize
+        self._events = deque()
+        self._overflowed = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def put(self, event):
+        with self._lock:
+            if self._overflowed:
+                return
+            if len(self._events) >= self._maxsize:
+                # 못 따라오는 구독자 - 쌓인 이벤트 대신 전체 동기화 신호 하나만 남김
+                self._events.clear()
+                self._overflowed = True
+                metrics.inc('memo_sse_dropped_total')
+            else:
+                self._events.append(event)
+        self._ready.set()
+
+    def get(self, timeout):
+        """timeout 동안 기다렸다가 쌓인 이벤트를 모두 꺼냄 - [(이름, 데이터), ...]"""
+        if not self._ready.wait(timeout):
+            return []
+        with self._lock:
+            self._ready.clear()
+            if self._overflowed:
+                self._overflowed = False
+                return [('resync', {})]
+            events = [('memo', event) for event in self._events]
+            self._events.clear()
+        return events
+
+class Hub:
+    """사용자별 구독자 목록 (프로세스 안)"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        sub = Subscription(user_id)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def deliver(self, user_id, event):
+        """이 프로세스의 구독자에게만 전달"""
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for sub in subs:
+            sub.put(event)
+        if subs:
+            metrics.inc('memo_sse_events_total', len(subs))
+
+    def count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+class UnixSocketBroker:
+    """같은 호스트 워커끼리 Unix 데이터그램 소켓으로 이벤트 전달
+
+    워커마다 directory/<pid>.sock 을 열고, 발행할 때 디렉터리의 다른 소켓에 한 번씩 보냄
+    받는 쪽 버퍼가 차 있으면 기다리지 않고 버림 (클라이언트는 변경 API로 따라잡음)
+    """
+
+    # 다른 워커 소켓 목록을 다시 읽는 주기(초)
+    PEER_REFRESH = 2.0
+
+    def __init__(self, directory, on_message):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f'{os.getpid()}.sock')
+        self._on_message = on_message
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._recv = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._recv.bind(self.path)
+        self._send = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send.setblocking(False)
+        self._peers = []
+        self._peers_at = 0.0
+        threading.Thread(target=self._receive_loop, name='event-broker', daemon=True).start()
+        atexit.register(self.close)
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _peer_paths(self):
+        now = time.monotonic()
+        if now - self._peers_at > self.PEER_REFRESH:
+            try:
+                self._peers = [entry.path for entry in os.scandir(self.directory)
+                               if entry.name.endswith('.sock') and entry.path != self.path]
+            except OSError:
+                self._peers = []
+            self._peers_at = now
+        return self._peers
+
+    def publish(self, payload):
+        for path in list(self._peer_paths()):
+            try:
+                self._send.sendto(payload, path)
+            except BlockingIOError:
+                metrics.inc('memo_event_broker_dropped_total')
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 종료된 워커의 소켓 - 정리하고 목록에서 제외
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                self._peers_at = 0.0
+            except OSError as e:
+                log.warning("Event broker send to %s failed: %s", path, e)
+
+    def _receive_loop(self):
+        while True:
+            try:
+                payload = self._recv.recv(65536)
+                message = json.loads(payload)
+                self._on_message(message['u'], message['e'])
+            except Exception as e:
+                log.warning("Event broker receive failed: %s", e)
+
+hub = Hub()
+_streams = 0
+_streams_lock = threading.Lock()
+_broker = None
+_broker_pid = None
+_lock = threading.Lock()
+
+def create_broker(url, on_message):
+    parsed = urlparse(url)
+    if parsed.scheme == 'unix':
+        return UnixSocketBroker(parsed.path or '/tmp/memo-events', on_message)
+    raise ValueError(f"지원하지 않는 이벤트 브로커 URL: {url}")
+
+def _get_broker():
+    """프로세스(워커)마다 브로커 하나 - fork 이후 처음 쓸 때 생성"""
+    global _broker, _broker_pid
+    if not EVENT_BROKER_URL:
+        return None
+    if _broker_pid == os.getpid():
+        return _broker
+    with _lock:
+        if _broker_pid != os.getpid():
+            try:
+                _broker = create_broker(EVENT_BROKER_URL, hub.deliver)
+                log.info("Event broker: %s", _broker.path)
+            except (OSError, ValueError) as e:
+                log.error("Event broker disabled: %s", e)
+                _broker = None
+            _broker_pid = os.getpid()
+    return _broker
+
+def publish(user_id, event):
+    """메모 변경 알림 - 이 프로세스 구독자에게 바로, 다른 워커에는 브로커로 전달
+
+    실패해도 예외를 올리지 않음 (알림이 빠지면 클라이언트가 주기적 동기화로 따라잡음)
+    """
+    if not user_id:
+        return
+    try:
+        hub.deliver(user_id, event)
+        broker = _get_broker()
+        if broker is not None:
+            broker.publish(json.dumps({'u': user_id, 'e': event}, separators=(',', ':')).encode())
+    except Exception as e:
+        log.warning("Event publish failed: %s", e)
+
+def set_request_threads(count):
+    global _request_threads
+    _request_threads = count
+
+def max_streams():
+    """이 프로세스에서 동시에 열 수 있는 스트림 수
+
+    EVENT_MAX_STREAMS와 요청 스레드 수 - 1 중 작은 값 (다른 요청용 스레드를 하나 이상 남김)
+    """
+    return max(0, min(EVENT_MAX_STREAMS, _request_threads - 1))
+
+def acquire_stream():
+    """스트림 자리 하나 확보 (없으면 False) - 응답이 닫힐 때 release_stream() 호출"""
+    global _streams
+    with _streams_lock:
+        if _streams >= max_streams():
+            return False
+        _streams += 1
+        return True
+
+def release_stream():
+    global _streams
+    with _streams_lock:
+        _streams -= 1
+
+def start():
+    """구독을 받는 프로세스에서 브로커 수신 스레드 시작 (다른 워커의 발행을 받으려면 필요)"""
+    _get_broker()
+
+def format_sse(name, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {name}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+def stream(user_id, ready, heartbeat=EVENT_HEARTBEAT, max_seconds=EVENT_STREAM_MAX_SECONDS):
+    """SSE 응답 본문 생성기 - 끝나거나 클라이언트가 끊으면 구독 해제
+
+    ready: 연결 직후 보낼 데이터를 만드는 함수 (현재 순번 - 끊긴 동안의 변경을 따라잡는 데 사용)
+    응답 본문이 실제로 전송되기 시작할 때 구독하므로 전송 전에 끊긴 요청은 구독이 남지 않음
+    """
+    sub = hub.subscribe(user_id)
+    deadline = time.monotonic() + max_seconds
+    try:
+        # 구독 후에 순번을 읽어야 그 사이 변경을 놓치지 않음
+        data = ready()
+        yield f'retry: {_RETRY_MS}\n' + format_sse('ready', data, data.get('seq'))
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = sub.get(min(heartbeat, remaining))
+            if not events:
+                # 주석 줄 - 프록시가 유휴 연결을 끊지 않게 하고, 끊긴 클라이언트를 감지
+                yield ': ping\n\n'
+                continue
+            yield ''.join(format_sse(name, data, data.get('seq')) for name, data in events)
+    finally:
+        hub.unsubscribe(sub)
+
+metrics.register_gauge('memo_sse_subscribers', lambda: {(): hub.count()})
@@ -0,0 +1,75 @@
+"""템플릿 렌더링 캐시
+
+- 메모 카드 조각 캐시: 렌더링한 카드 HTML을 메모 id + 버전(요약 행 다이제스트) 키로 저장
+  메모는 수정되지 않으므로 목록이 바뀌어도 남은 카드는 다시 렌더링하지 않음
+  (FRAGMENT_CACHE_URL: memory://, file:///경로, none://)
+- Jinja 바이트코드 캐시: 컴파일한 템플릿을 파일로 남겨서 새 워커가 파싱/컴파일을 건너뜀
+  (TEMPLATE_BYTECODE_CACHE_DIR, 설정하지 않으면 Jinja 기본값인 사용자 전용(0700) 임시 디렉터리,
+   빈 값이면 사용 안 함 - 다른 사용자가 쓸 수 있는 디렉터리는 지정하지 말 것)
+"""
+import hashlib as hl
+import os
+
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+import applog
+import cache
+import metrics
+import storage
+
+log = applog.get_logger('fragments')
+
+CARD_TEMPLATE = '_memo_card.html'
+
+fragment_cache = cache.create_cache(
+    os.getenv('FRAGMENT_CACHE_URL', 'memory://?maxsize=4096&ttl=3600'))
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv('TEMPLATE_BYTECODE_CACHE_DIR')
+
+_env = None
+# 카드 템플릿 소스 다이제스트 - 배포로 템플릿이 바뀌면 공유 캐시의 예전 조각을 쓰지 않음
+_card_version = ''
+# 템플릿 전체 소스 다이제스트 - 페이지 ETag에 넣어서 배포 후 예전 HTML로 304를 주지 않음
+template_version = ''
+
+def init_app(app):
+    """바이트코드 캐시 설정 + 템플릿에 memo_card() 등록 (템플릿을 처음 불러오기 전에 호출)"""
+    global _env, _card_version, template_version
+    env = app.jinja_env
+    if TEMPLATE_BYTECODE_CACHE_DIR != '':
+        try:
+            if TEMPLATE_BYTECODE_CACHE_DIR:
+                os.makedirs(TEMPLATE_BYTECODE_CACHE_DIR, mode=0o700, exist_ok=True)
+            env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE_DIR)
+        except (OSError, RuntimeError) as e:
+            log.warning("Template bytecode cache disabled: %s", e)
+    source = env.loader.get_source(env, CARD_TEMPLATE)[0]
+    _card_version = hl.blake2b(source.encode(), digest_size=6).hexdigest()
+    digest = hl.blake2b(digest_size=6)
+    for name in sorted(env.loader.list_templates()):
+        digest.update(name.encode() + b'\0' + env.loader.get_source(env, name)[0].encode())
+    template_version = digest.hexdigest()
+    env.globals['memo_card'] = memo_card
+    env.globals['preview_truncated'] = storage.preview_truncated
+    _env = env
+
+def card_key(memo):
+    """(id, title, preview, created_at, content_length) 요약 행의 캐시 키"""
+    digest = hl.blake2b(repr(tuple(memo)).encode(), digest_size=8).hexdigest()
+    return f"card:{_card_version}:{memo[0]}:{digest}"
+
+def memo_card(memo):
+    """메모 카드 HTML (캐시에 없을 때만 렌더링)"""
+    key = card_key(memo)
+    html = fragment_cache.get(key)
+    if html is cache.MISS:
+        html = _env.get_template(CARD_TEMPLATE).render(memo=memo)
+        fragment_cache.set(key, html)
+    return Markup(html)
+
+def _fragment_gauge(field):
+    return lambda: {(('cache', 'fragments'),): fragment_cache.stats()[field]}
+
+metrics.register_gauge('memo_fragment_cache_hits', _fragment_gauge('hits'))
+metrics.register_gauge('memo_fragment_cache_misses', _fragment_gauge('misses'))
+metrics.register_gauge('memo_fragment_cache_entries', _fragment_gauge('size'))
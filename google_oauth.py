@@ -0,0 +1,219 @@
+import base64
+import hashlib as hl
+import hmac
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import applog
+import metrics
+
+log = applog.get_logger('oauth')
+
+GOOGLE_DISCOVERY_URL = os.getenv(
+    'GOOGLE_DISCOVERY_URL', 'https://accounts.google.com/.well-known/openid-configuration')
+# 디스커버리 문서를 못 받을 때 사용할 기본 엔드포인트
+DEFAULT_ENDPOINTS = {
+    'issuer': 'https://accounts.google.com',
+    'authorization_endpoint': 'https://accounts.google.com/o/oauth2/v2/auth',
+    'token_endpoint': 'https://oauth2.googleapis.com/token',
+    'userinfo_endpoint': 'https://www.googleapis.com/oauth2/v1/userinfo',
+    'jwks_uri': 'https://www.googleapis.com/oauth2/v3/certs',
+}
+# Google은 iss를 스킴 없이 보내기도 함
+GOOGLE_ISSUERS = ('https://accounts.google.com', 'accounts.google.com')
+
+OAUTH_CONNECT_TIMEOUT = float(os.getenv('OAUTH_CONNECT_TIMEOUT', 3))
+OAUTH_READ_TIMEOUT = float(os.getenv('OAUTH_READ_TIMEOUT', 5))
+OAUTH_RETRIES = int(os.getenv('OAUTH_RETRIES', 2))
+OAUTH_POOL_SIZE = int(os.getenv('OAUTH_POOL_SIZE', 10))
+# Cache-Control이 없을 때 디스커버리/JWKS 캐시 시간(초)
+OAUTH_DOCUMENT_TTL = float(os.getenv('OAUTH_DOCUMENT_TTL', 3600))
+# ID 토큰 exp/iat 검사 시 허용하는 시계 오차(초)
+ID_TOKEN_LEEWAY = 60
+
+# RSASSA-PKCS1-v1_5 SHA-256 DigestInfo 접두사
+_SHA256_DIGEST_INFO = bytes.fromhex('3031300d060960864801650304020105000420')
+
+class OAuthError(Exception):
+    """Google OAuth 통신/검증 실패"""
+    pass
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+_documents = {}  # url -> (만료 시각, 문서)
+
+def get_session():
+    """프로세스 공용 requests.Session (keep-alive 커넥션 풀 + 재시도)
+
+    fork된 워커에서는 부모의 소켓을 공유하지 않도록 새로 만듦
+    """
+    global _session, _session_pid
+    if _session is not None and _session_pid == os.getpid():
+        return _session
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            retry = Retry(
+                total=OAUTH_RETRIES,
+                connect=OAUTH_RETRIES,
+                read=OAUTH_RETRIES,
+                status=OAUTH_RETRIES,
+                backoff_factor=0.2,
+                status_forcelist=(500, 502, 503, 504),
+                # 인가 코드는 한 번만 쓸 수 있으므로 POST는 연결 실패만 재시도
+                allowed_methods=frozenset(['GET']),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=OAUTH_POOL_SIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+def _request(method, url, call, **kwargs):
+    kwargs.setdefault('timeout', (OAUTH_CONNECT_TIMEOUT, OAUTH_READ_TIMEOUT))
+    try:
+        with metrics.timer('memo_oauth_request_seconds', call=call):
+            return get_session().request(method, url, **kwargs)
+    except requests.RequestException as e:
+        log.error("OAuth %s request failed: %s", call, e)
+        raise OAuthError(f"Google 서버 통신 실패 ({call})")
+
+def _max_age(response):
+    match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+    return float(match.group(1)) if match else OAUTH_DOCUMENT_TTL
+
+def _get_document(url, call, force=False):
+    """JSON 문서를 Cache-Control max-age 동안 캐시해서 반환"""
+    now = time.monotonic()
+    cached = _documents.get(url)
+    if cached and not force and cached[0] > now:
+        return cached[1]
+    response = _request('GET', url, call)
+    if response.status_code != 200:
+        raise OAuthError(f"{call} 문서 조회 실패: HTTP {response.status_code}")
+    document = response.json()
+    _documents[url] = (now + _max_age(response), document)
+    return document
+
+def endpoints():
+    """OpenID 디스커버리 문서 (실패하면 기본 Google 엔드포인트)"""
+    try:
+        return {**DEFAULT_ENDPOINTS, **_get_document(GOOGLE_DISCOVERY_URL, 'discovery')}
+    except (OAuthError, ValueError) as e:
+        log.warning("OpenID discovery unavailable, using defaults: %s", e)
+        return dict(DEFAULT_ENDPOINTS)
+
+def exchange_code(code, client_id, client_secret, redirect_uri):
+    """인가 코드를 토큰으로 교환 (access_token, id_token 등이 담긴 dict)"""
+    response = _request('POST', endpoints()['token_endpoint'], 'token', data={
+        'client_id': client_id,
+        'client_secret': client_secret,
+        'code': code,
+        'grant_type': 'authorization_code',
+        'redirect_uri': redirect_uri,
+    })
+    if response.status_code != 200:
+        raise OAuthError('토큰 획득 실패')
+    return response.json()
+
+def fetch_userinfo(access_token):
+    """userinfo 엔드포인트 조회 (ID 토큰을 쓸 수 없을 때만 사용)"""
+    response = _request('GET', endpoints()['userinfo_endpoint'], 'userinfo',
+                        headers={'Authorization': f'Bearer {access_token}'})
+    if response.status_code != 200:
+        raise OAuthError('사용자 정보 조회 실패')
+    info = response.json()
+    return {
+        'id': info.get('id') or info.get('sub'),
+        'email': info.get('email'),
+        'name': info.get('name'),
+        'picture': info.get('picture'),
+    }
+
+def _b64url_decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _b64url_int(text):
+    return int.from_bytes(_b64url_decode(text), 'big')
+
+def rsa_verify_sha256(n, e, message, signature):
+    """RSASSA-PKCS1-v1_5 + SHA-256 서명 검증 (RS256)"""
+    k = (n.bit_length() + 7) // 8
+    if len(signature) != k:
+        return False
+    s = int.from_bytes(signature, 'big')
+    if s >= n:
+        return False
+    em = pow(s, e, n).to_bytes(k, 'big')
+    digest = _SHA256_DIGEST_INFO + hl.sha256(message).digest()
+    padding = k - 3 - len(digest)
+    if padding < 8:
+        return False
+    expected = b'\x00\x01' + b'\xff' * padding + b'\x00' + digest
+    return hmac.compare_digest(em, expected)
+
+def _signing_key(kid, jwks_uri):
+    """kid에 해당하는 공개키 (n, e) - 모르는 kid면 키 교체로 보고 JWKS를 한 번 새로 받음"""
+    for force in (False, True):
+        for key in _get_document(jwks_uri, 'jwks', force=force).get('keys', []):
+            if key.get('kid') == kid and key.get('kty') == 'RSA':
+                return _b64url_int(key['n']), _b64url_int(key['e'])
+    raise OAuthError('ID 토큰 서명 키를 찾을 수 없습니다')
+
+def verify_id_token(id_token, audience):
+    """Google ID 토큰(JWT)을 캐시된 JWKS로 로컬 검증하고 사용자 정보 반환"""
+    try:
+        header_b64, payload_b64, signature_b64 = id_token.split('.')
+        header = json.loads(_b64url_decode(header_b64))
+        claims = json.loads(_b64url_decode(payload_b64))
+        signature = _b64url_decode(signature_b64)
+    except ValueError:
+        raise OAuthError('ID 토큰 형식 오류')
+
+    if header.get('alg') != 'RS256':
+        raise OAuthError('지원하지 않는 ID 토큰 알고리즘')
+    config = endpoints()
+    n, e = _signing_key(header.get('kid'), config['jwks_uri'])
+    if not rsa_verify_sha256(n, e, f'{header_b64}.{payload_b64}'.encode(), signature):
+        raise OAuthError('ID 토큰 서명 검증 실패')
+
+    now = time.time()
+    issuers = GOOGLE_ISSUERS + (config.get('issuer'),)
+    if claims.get('iss') not in issuers:
+        raise OAuthError('ID 토큰 발급자 불일치')
+    audiences = claims.get('aud')
+    if audience not in (audiences if isinstance(audiences, list) else [audiences]):
+        raise OAuthError('ID 토큰 대상 불일치')
+    if float(claims.get('exp', 0)) < now - ID_TOKEN_LEEWAY:
+        raise OAuthError('ID 토큰 만료')
+    if float(claims.get('iat', 0)) > now + ID_TOKEN_LEEWAY:
+        raise OAuthError('ID 토큰 발급 시각 오류')
+
+    return {
+        'id': claims.get('sub'),
+        'email': claims.get('email'),
+        'name': claims.get('name'),
+        'picture': claims.get('picture'),
+    }
+
+def user_from_tokens(token_data, client_id):
+    """토큰 응답에서 사용자 정보 추출 - ID 토큰을 우선 로컬 검증하고, 없거나 실패하면 userinfo 조회"""
+    id_token = token_data.get('id_token')
+    if id_token:
+        try:
+            return verify_id_token(id_token, client_id)
+        except OAuthError as e:
+            log.warning("ID token verification failed, falling back to userinfo: %s", e)
+    access_token = token_data.get('access_token')
+    if not access_token:
+        raise OAuthError('액세스 토큰 없음')
+    return fetch_userinfo(access_token)
@@ -0,0 +1,257 @@
+import functools
+import glob
+import inspect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import applog
+
+log = applog.get_logger('metrics')
+
+# 여러 gunicorn 워커의 값을 합치기 위한 공유 디렉터리 (없으면 이 프로세스 값만 노출)
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+# 워커가 자기 스냅샷을 METRICS_DIR에 쓰는 주기(초)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 30, 100, 1000, 10000, 100000)
+
+HELP = {
+    'memo_db_query_seconds': 'db.py 함수 실행 시간',
+    'memo_db_query_errors_total': 'db.py 함수에서 발생한 DB 오류 수',
+    'memo_db_rows': 'db.py 함수가 읽거나 쓴 행 수',
+    'memo_db_pool_wait_seconds': '커넥션 풀 checkout 대기 시간',
+    'memo_db_reconnects_total': '끊겨서 버린 커넥션을 새 커넥션으로 바꾼 수',
+    'memo_db_dropped_connections_total': '헬스 체크 실패로 버린 커넥션 수',
+    'memo_http_request_seconds': 'Flask 라우트 처리 시간',
+    'memo_template_render_seconds': '템플릿 렌더링 시간',
+    'memo_oauth_request_seconds': 'Google OAuth 호출 시간',
+    'memo_db_pool_connections': '커넥션 풀의 커넥션 수',
+    'memo_cache_hits': '메모 캐시 적중 수',
+    'memo_cache_misses': '메모 캐시 실패 수',
+    'memo_cache_entries': '메모 캐시 항목 수',
+}
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> 값
+_histograms = {}  # (name, labels) -> [buckets, 버킷별 개수, 합, 개수]
+_gauge_callbacks = {}  # name -> 함수 () -> {labels: 값}
+_flusher = None
+_flusher_pid = None
+
+# 현재 실행 중인 db 함수 이름 (connection()에서 오류를 어느 쿼리에 기록할지 결정)
+current_query = ContextVar('current_query', default='unknown')
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    """카운터 증가"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    _ensure_flusher()
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """히스토그램에 값 기록"""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+        counts = hist[1]
+        for i, bound in enumerate(hist[0]):
+            if value <= bound:
+                counts[i] += 1
+                break
+        hist[2] += value
+        hist[3] += 1
+    _ensure_flusher()
+
+def register_gauge(name, callback):
+    """스냅샷 시점에 값을 계산하는 게이지 등록 (callback은 {labels dict tuple: 값} 반환)"""
+    _gauge_callbacks[name] = callback
+
+@contextmanager
+def timer(name, buckets=LATENCY_BUCKETS, **labels):
+    """with 블록 실행 시간을 히스토그램에 기록"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, buckets, **labels)
+
+def timed_query(func):
+    """db 함수 실행 시간 기록 데코레이터 (제너레이터 함수는 소비가 끝날 때까지 측정)"""
+    name = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(*args, **kwargs):
+            token = current_query.set(name)
+            start = time.perf_counter()
+            try:
+                yield from func(*args, **kwargs)
+            finally:
+                observe('memo_db_query_seconds', time.perf_counter() - start, query=name)
+                current_query.reset(token)
+        return gen_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = current_query.set(name)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe('memo_db_query_seconds', time.perf_counter() - start, query=name)
+            current_query.reset(token)
+    return wrapper
+
+def record_rows(count):
+    """현재 db 함수가 처리한 행 수 기록"""
+    observe('memo_db_rows', count, ROW_BUCKETS, query=current_query.get())
+
+def snapshot():
+    """이 프로세스의 현재 값 (JSON 직렬화 가능한 형태)"""
+    with _lock:
+        counters = [[name, list(labels), value] for (name, labels), value in _counters.items()]
+        histograms = [[name, list(labels), list(hist[0]), list(hist[1]), hist[2], hist[3]]
+                      for (name, labels), hist in _histograms.items()]
+    gauges = []
+    for name, callback in list(_gauge_callbacks.items()):
+        try:
+            for labels, value in callback().items():
+                gauges.append([name, list(labels), value])
+        except Exception as e:
+            log.warning("Gauge %s failed: %s", name, e)
+    return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+def flush():
+    """스냅샷을 METRICS_DIR/metrics-<pid>.json에 원자적으로 기록"""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot(), f)
+        os.replace(tmp, os.path.join(METRICS_DIR, f'metrics-{os.getpid()}.json'))
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception as e:
+            log.warning("Metrics flush failed: %s", e)
+
+def _ensure_flusher():
+    """METRICS_DIR가 있으면 프로세스(워커)마다 주기적 flush 스레드 시작"""
+    global _flusher, _flusher_pid
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        _flusher = threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True)
+        _flusher.start()
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _collect():
+    """모든 워커 스냅샷을 합침 - 카운터/히스토그램은 합산, 게이지는 살아있는 프로세스만 합산"""
+    if not METRICS_DIR:
+        snapshots = [snapshot()]
+    else:
+        flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+    counters, histograms, gauges = {}, {}, {}
+    for snap in snapshots:
+        alive = snap['pid'] == os.getpid() or _pid_alive(snap['pid'])
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, counts, total, count in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None or merged[0] != buckets:
+                merged = histograms[key] = [buckets, [0] * len(buckets), 0.0, 0]
+            merged[1] = [a + b for a, b in zip(merged[1], counts)]
+            merged[2] += total
+            merged[3] += count
+        if alive:
+            for name, labels, value in snap['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in items)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    """Prometheus text exposition format (0.0.4)"""
+    counters, histograms, gauges = _collect()
+    lines = []
+
+    def header(name, kind):
+        if HELP.get(name):
+            lines.append(f'# HELP {name} {HELP[name]}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for kind, series in (('counter', counters), ('gauge', gauges)):
+        last = None
+        for (name, labels), value in sorted(series.items()):
+            if name != last:
+                header(name, kind)
+                last = name
+            lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+
+    last = None
+    for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+        if name != last:
+            header(name, 'histogram')
+            last = name
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_number(float(bound)))])} {cumulative}')
+        lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(float(total))}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,190 @@
+"""테스트/벤치마크용 Google OAuth 스텁 서버
+
+디스커버리 문서, 토큰, userinfo, JWKS 엔드포인트를 로컬에서 흉내냄
+인가 코드 'user-<id>'를 보내면 sub=<id>인 사용자로 RS256 서명된 ID 토큰을 발급
+
+    python oauth_stub.py --port 8765
+    GOOGLE_DISCOVERY_URL=http://127.0.0.1:8765/.well-known/openid-configuration python app.py
+"""
+import argparse
+import base64
+import hashlib as hl
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# RSASSA-PKCS1-v1_5 SHA-256 DigestInfo 접두사
+_SHA256_DIGEST_INFO = bytes.fromhex('3031300d060960864801650304020105000420')
+
+_SMALL_PRIMES = [p for p in range(3, 2000, 2) if all(p % d for d in range(3, int(p ** 0.5) + 1, 2))]
+
+def _is_probable_prime(n, rounds=40):
+    if n < 2:
+        return False
+    for p in _SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for _ in range(rounds):
+        a = secrets.randbelow(n - 3) + 2
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = pow(x, 2, n)
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+def _random_prime(bits):
+    while True:
+        candidate = secrets.randbits(bits) | (1 << (bits - 1)) | (1 << (bits - 2)) | 1
+        if _is_probable_prime(candidate):
+            return candidate
+
+def generate_rsa_key(bits=2048, e=65537):
+    """테스트용 RSA 키 (n, e, d) - 운영 키 생성에는 사용하지 말 것"""
+    while True:
+        p = _random_prime(bits // 2)
+        q = _random_prime(bits // 2)
+        phi = (p - 1) * (q - 1)
+        if p != q and phi % e:
+            return p * q, e, pow(e, -1, phi)
+
+def _b64url(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _int_b64url(value):
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+class StubIdentityProvider:
+    """키와 발급 로직 (HTTP 핸들러와 분리해서 벤치마크에서 직접 쓸 수 있게 함)"""
+
+    def __init__(self, issuer, bits=2048):
+        self.issuer = issuer
+        self.kid = secrets.token_hex(8)
+        self.n, self.e, self.d = generate_rsa_key(bits)
+
+    def sign(self, claims):
+        header = {'alg': 'RS256', 'typ': 'JWT', 'kid': self.kid}
+        signing_input = (_b64url(json.dumps(header).encode()) + '.' +
+                         _b64url(json.dumps(claims).encode()))
+        k = (self.n.bit_length() + 7) // 8
+        digest = _SHA256_DIGEST_INFO + hl.sha256(signing_input.encode()).digest()
+        em = b'\x00\x01' + b'\xff' * (k - 3 - len(digest)) + b'\x00' + digest
+        signature = pow(int.from_bytes(em, 'big'), self.d, self.n).to_bytes(k, 'big')
+        return signing_input + '.' + _b64url(signature)
+
+    def user(self, sub):
+        return {
+            'sub': sub,
+            'email': f'user{sub}@example.com',
+            'name': f'Stub User {sub}',
+            'picture': f'{self.issuer}/avatar/{sub}.png',
+        }
+
+    def discovery(self):
+        return {
+            'issuer': self.issuer,
+            'authorization_endpoint': f'{self.issuer}/auth',
+            'token_endpoint': f'{self.issuer}/token',
+            'userinfo_endpoint': f'{self.issuer}/userinfo',
+            'jwks_uri': f'{self.issuer}/certs',
+        }
+
+    def jwks(self):
+        return {'keys': [{'kty': 'RSA', 'alg': 'RS256', 'use': 'sig', 'kid': self.kid,
+                          'n': _int_b64url(self.n), 'e': _int_b64url(self.e)}]}
+
+    def token(self, code, client_id):
+        if not code or not code.startswith('user-'):
+            return None
+        sub = code[len('user-'):]
+        now = int(time.time())
+        claims = {'iss': self.issuer, 'aud': client_id, 'iat': now, 'exp': now + 3600,
+                  **self.user(sub)}
+        return {'access_token': f'access-{sub}', 'token_type': 'Bearer', 'expires_in': 3600,
+                'id_token': self.sign(claims)}
+
+def _make_handler(provider):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, body, max_age=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            if max_age is not None:
+                self.send_header('Cache-Control', f'public, max-age={max_age}')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == '/.well-known/openid-configuration':
+                self._json(200, provider.discovery(), max_age=3600)
+            elif path == '/certs':
+                self._json(200, provider.jwks(), max_age=3600)
+            elif path == '/userinfo':
+                auth = self.headers.get('Authorization', '')
+                if not auth.startswith('Bearer access-'):
+                    self._json(401, {'error': 'invalid_token'})
+                    return
+                info = provider.user(auth[len('Bearer access-'):])
+                self._json(200, {'id': info['sub'], **info})
+            else:
+                self._json(404, {'error': 'not_found'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            form = {k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+            if urlparse(self.path).path != '/token':
+                self._json(404, {'error': 'not_found'})
+                return
+            tokens = provider.token(form.get('code'), form.get('client_id'))
+            if tokens is None:
+                self._json(400, {'error': 'invalid_grant'})
+                return
+            self._json(200, tokens)
+
+    return Handler
+
+def start_stub_server(host='127.0.0.1', port=0, bits=2048):
+    """백그라운드 스레드에서 스텁 서버 시작 - (server, provider) 반환, 끝나면 server.shutdown()"""
+    server = ThreadingHTTPServer((host, port), None)
+    provider = StubIdentityProvider(f'http://{host}:{server.server_address[1]}', bits)
+    server.RequestHandlerClass = _make_handler(provider)
+    thread = threading.Thread(target=server.serve_forever, name='oauth-stub', daemon=True)
+    thread.start()
+    return server, provider
+
+def main():
+    parser = argparse.ArgumentParser(description='Google OAuth 스텁 서버')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--bits', type=int, default=2048, help='RSA 키 크기')
+    args = parser.parse_args()
+
+    server, provider = start_stub_server(args.host, args.port, args.bits)
+    print(f"OAuth stub listening on {provider.issuer}")
+    print(f"GOOGLE_DISCOVERY_URL={provider.issuer}/.well-known/openid-configuration")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import base64
+import hashlib as hl
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# scrypt 비용 파라미터 (python passwords.py --target-ms 250 으로 이 서버에 맞는 값 확인)
+PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+# 동시에 계산할 수 있는 해시 수 (CPU/메모리 보호) 와 자리가 날 때까지 기다릴 시간(초)
+PASSWORD_HASH_CONCURRENCY = int(os.getenv('PASSWORD_HASH_CONCURRENCY', max(1, os.cpu_count() or 1)))
+PASSWORD_HASH_WAIT = float(os.getenv('PASSWORD_HASH_WAIT', 5))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+class PasswordHasherBusy(Exception):
+    """해시 계산 슬롯이 PASSWORD_HASH_WAIT 안에 나지 않음"""
+    pass
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_CONCURRENCY)
+
+def _b64encode(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL 기본 maxmem(32MB)보다 큰 N도 쓸 수 있도록 필요한 만큼 지정
+    maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+    return hl.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=KEY_BYTES)
+
+def _run_limited(func, *args):
+    """동시 실행 수를 제한해서 별도 스레드에서 실행 (hashlib.scrypt는 GIL을 놓음)"""
+    if not _slots.acquire(timeout=PASSWORD_HASH_WAIT):
+        raise PasswordHasherBusy("비밀번호 처리 대기열이 가득 찼습니다")
+    try:
+        return _executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+def _hash(password, n, r, p):
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(key)}"
+
+def _verify(password, stored):
+    if is_legacy(stored):
+        candidate = hl.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(candidate, stored.lower())
+    try:
+        scheme, n, r, p, salt, key = stored.split('$')
+        if scheme != 'scrypt':
+            return False
+        expected = _b64decode(key)
+        actual = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+def is_legacy(stored):
+    """예전 방식(솔트 없는 SHA-256 hex) 해시인지"""
+    return len(stored) == 64 and all(c in '0123456789abcdefABCDEF' for c in stored)
+
+def hash_password(password):
+    """scrypt 해시 문자열 생성 (scrypt$N$r$p$salt$hash)"""
+    return _run_limited(_hash, password, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+
+def verify_password(password, stored):
+    """비밀번호가 저장된 해시와 맞는지 확인 (레거시 SHA-256 해시도 지원)"""
+    if not password or not stored:
+        return False
+    if is_legacy(stored):
+        return _verify(password, stored)
+    return _run_limited(_verify, password, stored)
+
+def needs_rehash(stored):
+    """레거시 해시이거나 현재 설정과 비용 파라미터가 다르면 True"""
+    if is_legacy(stored):
+        return True
+    try:
+        scheme, n, r, p, _, _ = stored.split('$')
+    except ValueError:
+        return True
+    return (scheme, int(n), int(r), int(p)) != (
+        'scrypt', PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+
+def measure(n, r=PASSWORD_SCRYPT_R, p=PASSWORD_SCRYPT_P, rounds=3):
+    """주어진 파라미터로 해시 한 번에 걸리는 시간(초, 중앙값)"""
+    salt = secrets.token_bytes(SALT_BYTES)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _scrypt('benchmark-password', salt, n, r, p)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+def calibrate(target_ms=250, r=PASSWORD_SCRYPT_R, p=PASSWORD_SCRYPT_P, max_n=2 ** 20):
+    """목표 로그인 지연시간을 넘지 않는 가장 큰 N(2의 거듭제곱) 찾기
+
+    반환: [(N, 걸린 시간 ms), ...] 측정 결과와 추천 N
+    """
+    results = []
+    best = 2 ** 10
+    n = 2 ** 10
+    while n <= max_n:
+        elapsed_ms = measure(n, r, p) * 1000
+        results.append((n, elapsed_ms))
+        if elapsed_ms > target_ms:
+            break
+        best = n
+        n *= 2
+    return results, best
+
+def main():
+    parser = argparse.ArgumentParser(description='scrypt 비용 파라미터 벤치마크')
+    parser.add_argument('--target-ms', type=float, default=250, help='로그인 한 번당 목표 해시 시간(ms)')
+    parser.add_argument('-r', type=int, default=PASSWORD_SCRYPT_R)
+    parser.add_argument('-p', type=int, default=PASSWORD_SCRYPT_P)
+    args = parser.parse_args()
+
+    results, best = calibrate(args.target_ms, args.r, args.p)
+    for n, elapsed_ms in results:
+        memory_mb = 128 * args.r * n / (1024 * 1024)
+        print(f"N={n:<8} r={args.r} p={args.p}  {elapsed_ms:8.1f} ms  {memory_mb:6.1f} MB")
+    print()
+    print(f"# 목표 {args.target_ms:.0f} ms 기준 추천 설정")
+    print(f"PASSWORD_SCRYPT_N={best}")
+    print(f"PASSWORD_SCRYPT_R={args.r}")
+    print(f"PASSWORD_SCRYPT_P={args.p}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""탈퇴 계정 메모 백그라운드 삭제 작업자
+
+db.delete_user는 사용자를 탈퇴 표시하고 account_purges에 작업을 넣기만 함
+이 작업자가 메모를 PURGE_BATCH_SIZE개씩 짧은 트랜잭션으로 지우고, 배치 사이에 쉬어서
+다른 요청의 잠금 대기/복제 지연을 줄임. 진행 상황은 배치마다 커밋되므로 중간에 죽어도
+점유 기간(PURGE_LEASE)이 지나면 어느 작업자든 이어서 처리함
+
+    python purge.py            # 별도 프로세스로 작업자 실행
+    python purge.py --status   # 진행 중인 작업 출력
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+import applog
+import db
+import metrics
+
+log = applog.get_logger('purge')
+
+PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', 1000))
+# 배치 사이 쉬는 시간(초)
+PURGE_THROTTLE = float(os.getenv('PURGE_THROTTLE', 0.05))
+# 새 작업 확인 주기(초)와 작업 점유 시간(초, 배치마다 연장)
+PURGE_POLL_INTERVAL = float(os.getenv('PURGE_POLL_INTERVAL', 5))
+PURGE_LEASE = float(os.getenv('PURGE_LEASE', 60))
+
+_wakeup = threading.Event()
+_worker_pid = None
+_lock = threading.Lock()
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+def purge_user(user_id, owner):
+    """점유한 작업 하나를 끝까지 처리 - 반환: 삭제한 메모 수, 점유를 잃었으면 None"""
+    total = 0
+    while True:
+        deleted = db.purge_account_batch(user_id, owner, PURGE_BATCH_SIZE, PURGE_LEASE)
+        if deleted is None:
+            log.warning("Lost purge lease for user %s after %d memos", user_id, total)
+            return None
+        total += deleted
+        metrics.inc('memo_account_purge_memos_total', deleted)
+        if deleted < PURGE_BATCH_SIZE:
+            break
+        time.sleep(PURGE_THROTTLE)
+    db.finish_account_purge(user_id, owner)
+    metrics.inc('memo_account_purges_total')
+    log.info("Purged user %s (%d memos)", user_id, total)
+    return total
+
+def run_once(owner=None):
+    """대기 중인 작업을 모두 처리 - 반환: 처리한 작업 수"""
+    owner = owner or _owner()
+    done = 0
+    while True:
+        user_id = db.claim_account_purge(owner, PURGE_LEASE)
+        if user_id is None:
+            return done
+        log.info("Purging memos for deleted user %s", user_id)
+        if purge_user(user_id, owner) is not None:
+            done += 1
+
+def _worker_loop():
+    owner = _owner()
+    while True:
+        try:
+            run_once(owner)
+        except Exception as e:
+            log.error("Account purge failed: %s", e)
+        _wakeup.wait(PURGE_POLL_INTERVAL)
+        _wakeup.clear()
+
+def start_worker():
+    """프로세스(워커)마다 백그라운드 삭제 스레드 하나 시작"""
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+        threading.Thread(target=_worker_loop, name='account-purge', daemon=True).start()
+
+def wake():
+    """새 작업이 생겼음을 알려서 다음 확인 주기를 기다리지 않게 함"""
+    _wakeup.set()
+
+def main():
+    parser = argparse.ArgumentParser(description='탈퇴 계정 메모 삭제 작업자')
+    parser.add_argument('--status', action='store_true', help='진행 중인 작업만 출력하고 종료')
+    parser.add_argument('--once', action='store_true', help='대기 중인 작업을 처리하고 종료')
+    args = parser.parse_args()
+
+    if args.status:
+        for item in db.account_purge_status():
+            print(json.dumps(item, ensure_ascii=False))
+        return
+    if args.once:
+        print(f"purged {run_once()} accounts")
+        return
+    log.info("Account purge worker started")
+    _worker_loop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""요청 속도 제한과 동시 요청 수 제한
+
+- 토큰 버킷: 규칙(login, register, memo_write)마다 IP/사용자별 버킷, 다 쓰면 429
+  RATE_LIMIT_<규칙>=횟수/초 (예: RATE_LIMIT_LOGIN=10/60, 0이면 끔)
+  RATE_LIMIT_STORE_URL: memory://?maxsize=10000 (워커별), sqlite:////tmp/memo-ratelimit.db (워커끼리 공유)
+- AdmissionControl: 처리 중인 요청이 MAX_CONCURRENT_REQUESTS를 넘거나 프록시 대기열에서
+  MAX_QUEUE_MS보다 오래 기다린 요청은 처리하지 않고 바로 503 (타임아웃까지 쌓이지 않게)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+from werkzeug.wsgi import ClosingIterator
+
+import applog
+import metrics
+
+log = applog.get_logger('ratelimit')
+
+# 규칙별 기본값 (횟수/초)
+DEFAULT_RULES = {
+    'login': '10/60',
+    'register': '5/3600',
+    'memo_write': '120/60',
+}
+
+def parse_rule(text):
+    """'횟수/초' -> (버킷 크기, 초당 충전량), 0이나 빈 값이면 None (제한 없음)"""
+    if not text or text.strip() == '0':
+        return None
+    try:
+        count, _, seconds = text.partition('/')
+        count, seconds = float(count), float(seconds or 1)
+    except ValueError:
+        log.warning("Invalid rate limit %r; ignored", text)
+        return None
+    if count <= 0 or seconds <= 0:
+        return None
+    return count, count / seconds
+
+RULES = {name: parse_rule(os.getenv(f'RATE_LIMIT_{name.upper()}', default))
+         for name, default in DEFAULT_RULES.items()}
+
+class MemoryBucketStore:
+    """프로세스 안 버킷 (오래 안 쓴 키부터 버림 - 버려진 키는 가득 찬 버킷으로 다시 시작)"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+class SQLiteBucketStore:
+    """SQLite 파일에 버킷 저장 - 같은 호스트의 워커끼리 한도를 공유 (BEGIN IMMEDIATE로 원자적 갱신)"""
+
+    # 이 시간(초) 동안 안 쓴 버킷은 가득 찬 것과 같으므로 지움
+    IDLE_SECONDS = 86400
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, path, busy_timeout_ms=1000):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._takes = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                   check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate, now=None):
+        # 여러 프로세스가 쓰므로 monotonic 대신 벽시계 사용
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            self._takes += 1
+            if self._takes % self.CLEANUP_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - self.IDLE_SECONDS,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if allowed else (1 - tokens) / rate
+
+def create_store(url):
+    parsed = urlparse(url or 'memory://')
+    options = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+    if parsed.scheme == 'memory':
+        return MemoryBucketStore(maxsize=int(options.get('maxsize', 10000)))
+    if parsed.scheme == 'sqlite':
+        path = parsed.path[1:] if parsed.path.startswith('/') else parsed.path
+        return SQLiteBucketStore(path or 'ratelimit.db',
+                                 busy_timeout_ms=int(options.get('busy_timeout_ms', 1000)))
+    raise ValueError(f"지원하지 않는 속도 제한 저장소 URL: {url}")
+
+store = create_store(os.getenv('RATE_LIMIT_STORE_URL', 'memory://'))
+
+def check(rule, *keys):
+    """rule의 버킷에서 keys마다 토큰 하나씩 사용 - 허용이면 0, 거부면 다시 시도할 때까지 초
+
+    저장소 오류로 요청을 막지는 않음 (제한 없이 통과)
+    """
+    limit = RULES.get(rule)
+    if limit is None:
+        return 0.0
+    capacity, rate = limit
+    for key in keys:
+        if key is None:
+            continue
+        try:
+            wait = store.take(f'{rule}:{key}', capacity, rate)
+        except Exception as e:
+            log.warning("Rate limit store failed: %s", e)
+            return 0.0
+        if wait > 0:
+            metrics.inc('memo_rate_limited_total', rule=rule)
+            return wait
+    return 0.0
+
+# 워커(프로세스)당 동시에 처리할 요청 수 (0이면 제한 없음 - THREADS/ASGI_THREADS에 맞춰 설정)
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', 0))
+# 프록시가 X-Request-Start를 붙이는 경우, 이보다 오래 기다린 요청은 처리하지 않음 (0이면 끔)
+MAX_QUEUE_MS = float(os.getenv('MAX_QUEUE_MS', 10000))
+
+def queue_ms(environ):
+    """X-Request-Start (t=초/밀리초/마이크로초) 기준 프록시 이후 대기 시간(밀리초), 없으면 None"""
+    header = environ.get('HTTP_X_REQUEST_START')
+    if not header:
+        return None
+    try:
+        started = float(header.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, (time.time() - started) * 1000)
+
+class AdmissionControl:
+    """WSGI 미들웨어 - 과부하일 때 라우팅/세션/DB 전에 바로 503으로 응답"""
+
+    def __init__(self, app, max_concurrent=MAX_CONCURRENT_REQUESTS, max_queue_ms=MAX_QUEUE_MS):
+        self.app = app
+        self.max_queue_ms = max_queue_ms
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+
+    def _reject(self, start_response, reason):
+        metrics.inc('memo_admission_rejected_total', reason=reason)
+        body = json.dumps({'error': '요청이 많습니다. 잠시 후 다시 시도하세요.'}).encode()
+        start_response('503 Service Unavailable', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', '1'),
+        ])
+        return [body]
+
+    def __call__(self, environ, start_response):
+        if self.max_queue_ms:
+            waited = queue_ms(environ)
+            if waited is not None and waited > self.max_queue_ms:
+                # 클라이언트는 이미 포기했을 가능성이 큼 - 처리해도 버려질 일을 하지 않음
+                return self._reject(start_response, 'queue')
+        if self._slots is None:
+            return self.app(environ, start_response)
+        if not self._slots.acquire(blocking=False):
+            return self._reject(start_response, 'concurrency')
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._slots.release()
+
+        def start(status, headers, exc_info=None):
+            # SSE 스트림은 몇 분씩 열려 있으므로 헤더를 보내는 시점에 슬롯 반납
+            # (스트림 수는 events.max_streams()가 따로 제한)
+            if any(name.lower() == 'content-type' and value.startswith('text/event-stream')
+                   for name, value in headers):
+                release()
+            return start_response(status, headers, exc_info)
+
+        try:
+            # 그 밖의 스트리밍 응답은 본문을 다 보낼 때까지 슬롯을 잡고 있음
+            return ClosingIterator(self.app(environ, start), release)
+        except BaseException:
+            release()
+            raise
@@ -0,0 +1,89 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+# 단어 구분: 글자/숫자가 아닌 문자 (한글 포함 유니코드 단어 문자는 유지)
+_WORD_SPLIT = re.compile(r'[\W_]+', re.UNICODE)
+
+# 제목에 나온 토큰은 본문보다 가중치를 더 줌
+TITLE_WEIGHT = 2.0
+
+def ngrams(text, n=2):
+    """MySQL ngram 파서와 같은 방식으로 단어를 n글자씩 잘라 토큰 생성
+
+    띄어쓰기가 불규칙한 한국어도 부분 일치로 찾을 수 있음
+    n보다 짧은 단어는 그대로 토큰으로 사용
+    """
+    for word in _WORD_SPLIT.split(text.lower()):
+        if not word:
+            continue
+        if len(word) <= n:
+            yield word
+            continue
+        for i in range(len(word) - n + 1):
+            yield word[i:i + n]
+
+class NgramIndex:
+    """메모용 메모리 역색인 (MySQL FULLTEXT를 쓸 수 없을 때의 대체)
+
+    검색은 질의 토큰의 posting 리스트만 훑으므로 전체 메모 수가 아니라
+    일치하는 메모 수에 비례하는 시간이 걸림
+    """
+
+    def __init__(self, n=2):
+        self.n = n
+        self._postings = defaultdict(dict)  # token -> {memo_id: 가중 빈도}
+        self._docs = {}  # memo_id -> (row, tokens)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, row):
+        """row: (id, title, content, ...) 형태의 메모 행"""
+        memo_id, title, content = row[0], row[1], row[2]
+        weights = defaultdict(float)
+        for token in ngrams(title or '', self.n):
+            weights[token] += TITLE_WEIGHT
+        for token in ngrams(content or '', self.n):
+            weights[token] += 1.0
+        with self._lock:
+            self.remove(memo_id)
+            for token, weight in weights.items():
+                self._postings[token][memo_id] = weight
+            self._docs[memo_id] = (row, tuple(weights))
+
+    def remove(self, memo_id):
+        with self._lock:
+            entry = self._docs.pop(memo_id, None)
+            if entry is None:
+                return
+            for token in entry[1]:
+                posting = self._postings.get(token)
+                if posting is not None:
+                    posting.pop(memo_id, None)
+                    if not posting:
+                        del self._postings[token]
+
+    def search(self, query, limit=20, offset=0):
+        """TF-IDF 점수 내림차순, 동점이면 id 내림차순
+
+        반환: [(row, score), ...]
+        """
+        tokens = set(ngrams(query, self.n))
+        if not tokens:
+            return []
+        with self._lock:
+            total = len(self._docs)
+            scores = defaultdict(float)
+            for token in tokens:
+                posting = self._postings.get(token)
+                if not posting:
+                    continue
+                idf = math.log(1 + total / len(posting))
+                for memo_id, weight in posting.items():
+                    scores[memo_id] += (1 + math.log(weight)) * idf
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+            page = ranked[offset:offset + limit]
+            return [(self._docs[memo_id][0], score) for memo_id, score in page]
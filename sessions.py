@@ -0,0 +1,208 @@
+"""서버 사이드 세션 저장소
+
+쿠키에는 추측할 수 없는 세션 id만 넣고 내용은 저장소에 둠 (SESSION_STORE_URL)
+
+- memory://?maxsize=10000           워커별 LRU (워커가 하나일 때만 사용)
+- file:///var/lib/memo/sessions      같은 호스트 워커끼리 공유하는 파일 저장소
+                                     (실행 사용자 소유, 다른 사용자가 쓸 수 없는 디렉터리만 허용)
+- sqlite:////var/lib/memo/sessions.db 같은 호스트 워커끼리 공유하는 SQLite 저장소 (WAL)
+
+만료된 세션은 요청 처리와 별개로 백그라운드 스레드가 주기적으로 정리함
+"""
+import json
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import applog
+import cache
+import metrics
+
+log = applog.get_logger('sessions')
+
+# 세션 유효 시간(초) - 마지막 갱신 후 이 시간 동안 사용이 없으면 만료
+SESSION_LIFETIME = float(os.getenv('SESSION_LIFETIME', 7 * 24 * 3600))
+# 만료 세션 정리 주기(초)
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', 300))
+
+_SID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+
+class SQLiteSessionStore:
+    """SQLite 파일 하나에 세션 저장 (스레드별 연결, WAL, JSON 인코딩)"""
+
+    def __init__(self, path, busy_timeout_ms=5000):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                   check_same_thread=False, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else cache.MISS
+
+    def set(self, key, value, ttl=None):
+        ttl = SESSION_LIFETIME if ttl is None else ttl
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, separators=(',', ':')), time.time() + ttl),
+        )
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (key,))
+
+    def sweep(self):
+        return self._connection().execute(
+            "DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+def create_store(url):
+    """SESSION_STORE_URL로 저장소 생성 (memory/file은 cache.py 백엔드 재사용)"""
+    parsed = urlparse(url)
+    if parsed.scheme == 'sqlite':
+        options = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        path = parsed.path[1:] if parsed.path.startswith('/') else parsed.path
+        return SQLiteSessionStore(path or 'sessions.db',
+                                  busy_timeout_ms=int(options.get('busy_timeout_ms', 5000)))
+    if parsed.scheme in ('memory', 'file'):
+        return cache.create_cache(url)
+    raise ValueError(f"지원하지 않는 세션 저장소 URL: {url}")
+
+class ServerSession(CallbackDict, SessionMixin):
+    """저장소에 보관되는 세션 (값이 바뀌면 modified=True)"""
+
+    def __init__(self, initial=None, sid=None, new=False, stale=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        # 저장한 지 오래돼서 만료 시간을 연장해야 함
+        self.stale = stale
+        self.rotate_from = None
+
+    def rotate(self):
+        """세션 id 새로 발급 (로그인 직후 호출 - 세션 고정 공격 방지)"""
+        if self.rotate_from is None and not self.new:
+            self.rotate_from = self.sid
+        self.sid = new_sid()
+        self.modified = True
+
+def new_sid():
+    return secrets.token_urlsafe(32)
+
+def rotate(session):
+    """서버 세션이면 id를 새로 발급 (쿠키 세션이면 아무것도 안 함)"""
+    if isinstance(session, ServerSession):
+        session.rotate()
+
+class ServerSessionInterface(SessionInterface):
+    """쿠키에는 세션 id만, 내용은 store에 저장하는 Flask 세션 인터페이스"""
+
+    def __init__(self, store, lifetime=SESSION_LIFETIME):
+        self.store = store
+        self.lifetime = lifetime
+
+    @staticmethod
+    def _key(sid):
+        return f"session:{sid}"
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID_PATTERN.match(sid):
+            stored = self.store.get(self._key(sid))
+            if stored is not cache.MISS:
+                # 만료까지 절반 이하로 남았으면 이번 응답에서 연장
+                stale = time.time() - stored.get('t', 0) > self.lifetime / 2
+                return ServerSession(stored.get('d'), sid=sid, stale=stale)
+        return ServerSession(sid=new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.rotate_from:
+            self.store.delete(self._key(session.rotate_from))
+
+        if not session:
+            if not session.new:
+                self.store.delete(self._key(session.sid))
+            if session.modified or session.rotate_from:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        response.vary.add('Cookie')
+        if not (session.modified or session.stale):
+            return
+        self.store.set(self._key(session.sid), {'t': time.time(), 'd': dict(session)},
+                       ttl=self.lifetime)
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+_sweeper_pid = None
+_lock = threading.Lock()
+
+def _sweep_loop(store):
+    while True:
+        time.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            removed = store.sweep()
+            if removed:
+                metrics.inc('memo_sessions_expired_total', removed)
+                log.info("Swept %d expired sessions", removed)
+        except Exception as e:
+            log.warning("Session sweep failed: %s", e)
+
+def start_sweeper(store):
+    """프로세스(워커)마다 만료 세션 정리 스레드 하나 시작"""
+    global _sweeper_pid
+    if _sweeper_pid == os.getpid() or SESSION_SWEEP_INTERVAL <= 0:
+        return
+    with _lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+        threading.Thread(target=_sweep_loop, args=(store,), name='session-sweeper', daemon=True).start()
+
+def init_app(app, url):
+    """app.session_interface를 서버 사이드 세션으로 교체하고 정리 스레드 시작"""
+    store = create_store(url)
+    app.session_interface = ServerSessionInterface(store)
+    start_sweeper(store)
+    log.info("Server-side sessions: %s", urlparse(url).scheme)
+    return store
@@ -11,19 +11,43 @@ export $(cat .env | xargs)
 # 포트 설정 (기본값: 8000)
 PORT=${PORT:-8000}
 WORKERS=${WORKERS:-4}
+# 워커당 스레드 수 (1보다 크면 gunicorn이 gthread 워커를 사용, DB 커넥션 풀 공유)
+# 앱도 이 값을 읽음: 실시간 알림(SSE) 스트림은 워커당 min(EVENT_MAX_STREAMS, THREADS-1)개까지
+# (스트림이 스레드를 하나씩 점유하므로 다른 요청용 스레드를 남김, THREADS=1이면 주기적 동기화만 사용)
+export THREADS=${THREADS:-1}
+# sync: gunicorn WSGI 워커 / async: uvicorn ASGI 워커 (워커당 ASGI_THREADS개 동시 요청)
+SERVER_MODE=${SERVER_MODE:-sync}
+# 워커별 메트릭을 /metrics에서 합산하기 위한 공유 디렉터리 (재시작 시 초기화)
+export METRICS_DIR=${METRICS_DIR:-/tmp/memo-metrics}
+rm -rf "$METRICS_DIR" && mkdir -p "$METRICS_DIR"
 
 echo "🚀 프로덕션 서버 시작..."
 echo "포트: $PORT"
 echo "워커: $WORKERS"
+echo "스레드: $THREADS"
+echo "모드: $SERVER_MODE"
 echo "환경: production"
 
 # Gunicorn으로 서버 시작
-gunicorn \
-  --workers=$WORKERS \
-  --worker-class=sync \
-  --bind=0.0.0.0:$PORT \
-  --timeout=120 \
-  --access-logfile=- \
-  --error-logfile=- \
-  --log-level=info \
-  app:app
+if [ "$SERVER_MODE" = "async" ]; then
+  gunicorn \
+    --workers=$WORKERS \
+    --worker-class=uvicorn_worker.UvicornWorker \
+    --bind=0.0.0.0:$PORT \
+    --timeout=120 \
+    --access-logfile=- \
+    --error-logfile=- \
+    --log-level=info \
+    asgi:app
+else
+  gunicorn \
+    --workers=$WORKERS \
+    --worker-class=sync \
+    --threads=$THREADS \
+    --bind=0.0.0.0:$PORT \
+    --timeout=120 \
+    --access-logfile=- \
+    --error-logfile=- \
+    --log-level=info \
+    app:app
+fi
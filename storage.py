@@ -0,0 +1,402 @@
+import fcntl
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import applog
+import metrics
+
+log = applog.get_logger('storage')
+
+# 목록용 미리보기 길이(글자 수) - preview 컬럼(VARCHAR(255))에 들어가도록 제한
+PREVIEW_CHARS = max(1, min(int(os.getenv('MEMO_PREVIEW_CHARS', 160)), 255))
+
+def make_preview(content):
+    """목록에 보여줄 미리보기 (공백/줄바꿈을 한 칸으로 줄이고 PREVIEW_CHARS 글자로 자름)"""
+    return ' '.join(content.split())[:PREVIEW_CHARS]
+
+def preview_truncated(preview, content_length):
+    """make_preview가 글자를 잘라냈는지 (공백/줄바꿈만 줄어든 경우는 잘린 것이 아님)
+
+    잘렸으면 미리보기가 PREVIEW_CHARS 글자로 꽉 차 있고 원문은 그보다 김
+    """
+    return len(preview) >= PREVIEW_CHARS and content_length > len(preview)
+
+def backfill_previews(cur, batch_size=500):
+    """preview/content_length가 비어 있는 기존 메모를 id 순서로 batch_size개씩 채움
+
+    batch마다 커밋해서 큰 테이블에서도 트랜잭션/잠금이 길어지지 않게 함
+    """
+    last_id = 0
+    total = 0
+    while True:
+        cur.execute(
+            "SELECT id, content FROM memos WHERE id > %s AND preview IS NULL ORDER BY id LIMIT %s",
+            (last_id, batch_size),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        cur.executemany(
+            "UPDATE memos SET preview = %s, content_length = %s WHERE id = %s",
+            [(make_preview(content), len(content), memo_id) for memo_id, content in rows],
+        )
+        cur.connection.commit()
+        last_id = rows[-1][0]
+        total += len(rows)
+    if total:
+        log.info("Backfilled previews for %d memos", total)
+
+class StorageBackend:
+    """db.py 함수들이 사용하는 저장소 백엔드 인터페이스
+
+    add_user, verify_user, add_memo, get_memos, delete_memo, delete_user, user_exists 등
+    db.py의 공개 함수는 캐시/메트릭/로그를 처리하고, 실제 SQL 실행은 백엔드가 준
+    (DB, cur)로 수행함 (SQL 파라미터는 두 백엔드 모두 %s 형식)
+    """
+
+    name = None
+
+    @contextmanager
+    def connection(self, read=False):
+        """(DB, cur) 제공 - DB는 commit/rollback/cursor, cur는 execute/executemany/fetch* 지원
+
+        read=True는 읽기 전용 작업 표시 (복제본을 쓰는 백엔드만 구분)
+        """
+        raise NotImplementedError
+        yield
+
+    def stream_cursor(self, DB):
+        """결과를 한 번에 메모리에 올리지 않고 fetchmany로 읽을 수 있는 커서"""
+        return DB.cursor()
+
+    def read_target(self):
+        """읽기가 향할 곳 ('primary' / 'replica') - 캐시 키 구분용"""
+        return 'primary'
+
+    def warmup(self):
+        """연결을 미리 만들고 스키마 확인"""
+        with self.connection():
+            pass
+
+    def reset(self):
+        """열린 연결을 모두 닫음 (다음 사용 시 다시 연결)"""
+
+    def stats(self):
+        """연결 상태 (메트릭 게이지용) - {'idle': n, 'in_use': n}"""
+        return {}
+
+class _SQLiteCursor:
+    """%s 파라미터를 ?로 바꿔서 실행하는 sqlite3 커서 래퍼
+
+    변환한 SQL 문자열은 캐시하고, sqlite3 연결의 statement 캐시가 같은 문자열의
+    prepared statement를 재사용함
+    """
+
+    _translated = {}
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @classmethod
+    def _sql(cls, query):
+        sql = cls._translated.get(query)
+        if sql is None:
+            sql = cls._translated[query] = query.replace('%s', '?')
+        return sql
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._sql(query), tuple(params))
+        return self._cursor.rowcount
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(self._sql(query), seq_of_params)
+        return self._cursor.rowcount
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+class _SQLiteConnection:
+    """sqlite3 연결 래퍼 (cursor()가 %s 파라미터를 지원하도록)"""
+
+    def __init__(self, conn):
+        self.raw = conn
+
+    def cursor(self, *args):
+        return _SQLiteCursor(self.raw.cursor())
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+# SQLite 기본 스키마 (MySQL의 ensure_schema + 마이그레이션 결과와 같은 구조)
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL UNIQUE,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS memos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        username TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+def _sqlite_columns(cur, table):
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+def _s001_memos_preview(cur):
+    """목록용 preview/content_length 컬럼 추가 후 기존 메모 채우기"""
+    columns = _sqlite_columns(cur, 'memos')
+    if 'preview' not in columns:
+        cur.execute("ALTER TABLE memos ADD COLUMN preview TEXT")
+    if 'content_length' not in columns:
+        cur.execute("ALTER TABLE memos ADD COLUMN content_length INTEGER")
+    backfill_previews(cur)
+
+def _s002_memos_user_id(cur, batch_size=5000):
+    """memos.user_id (users.id 참조, ON DELETE CASCADE)로 전환하고 username 컬럼 제거"""
+    columns = _sqlite_columns(cur, 'memos')
+    if 'user_id' not in columns:
+        cur.execute("ALTER TABLE memos ADD COLUMN user_id INTEGER REFERENCES users (id) ON DELETE CASCADE")
+    if 'username' in columns:
+        cur.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM memos WHERE user_id IS NULL")
+        low, high = cur.fetchone()
+        while low and low <= high:
+            cur.execute(
+                "UPDATE memos SET user_id = (SELECT id FROM users WHERE users.username = memos.username) "
+                "WHERE id >= %s AND id < %s AND user_id IS NULL",
+                (low, low + batch_size),
+            )
+            cur.connection.commit()
+            low += batch_size
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memos_userid_created ON memos (user_id, created_at, id)")
+    if 'username' in columns:
+        cur.execute("DROP INDEX IF EXISTS idx_memos_user_created")
+        cur.execute("ALTER TABLE memos DROP COLUMN username")
+
+def _s003_account_purges(cur):
+    """탈퇴 표시(users.deleted_at)와 백그라운드 메모 삭제 작업 테이블"""
+    if 'deleted_at' not in _sqlite_columns(cur, 'users'):
+        cur.execute("ALTER TABLE users ADD COLUMN deleted_at TIMESTAMP")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS account_purges (
+            user_id INTEGER PRIMARY KEY,
+            requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_memos INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_until REAL NOT NULL DEFAULT 0,
+            finished_at TIMESTAMP
+        )
+        """
+    )
+
+def _s004_memo_changes(cur):
+    """사용자별 변경 순번(users.memo_seq)과 추가/삭제 변경 기록 테이블"""
+    if 'memo_seq' not in _sqlite_columns(cur, 'users'):
+        cur.execute("ALTER TABLE users ADD COLUMN memo_seq INTEGER NOT NULL DEFAULT 0")
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memo_changes (
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            seq INTEGER NOT NULL,
+            memo_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, seq)
+        ) WITHOUT ROWID
+        """
+    )
+
+# (버전, 설명, 함수(cur)) - MySQL MIGRATIONS와 별도로 관리, 기본 스키마 이후 변경만 추가
+SQLITE_MIGRATIONS = [
+    (1, 'memos preview/content_length columns', _s001_memos_preview),
+    (2, 'memos.user_id foreign key to users.id', _s002_memos_user_id),
+    (3, 'users.deleted_at and account_purges queue', _s003_account_purges),
+    (4, 'users.memo_seq and memo_changes log', _s004_memo_changes),
+]
+
+def sqlite_path_from_url(url):
+    """sqlite:///상대경로, sqlite:////절대경로, sqlite:///:memory: 해석"""
+    parsed = urlparse(url)
+    path = parsed.path[1:] if parsed.path.startswith('/') else parsed.path
+    return path or ':memory:'
+
+class SQLiteBackend(StorageBackend):
+    """단일 노드용 내장 SQLite 백엔드
+
+    - 스레드마다 연결 하나 (sqlite3 연결은 스레드 간 공유하지 않음)
+    - WAL 모드: 쓰기 중에도 다른 스레드/프로세스가 읽을 수 있음
+    - busy_timeout: 다른 워커가 쓰는 중이면 잠시 기다렸다가 재시도
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, busy_timeout_ms=5000):
+        if path == ':memory:':
+            # 스레드별 연결이 같은 메모리 DB를 보도록 공유 캐시 URI 사용
+            self._target = f'file:memo-{os.getpid()}-{id(self)}?mode=memory&cache=shared'
+            self._uri = True
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._target = path
+            self._uri = False
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._schema_ready = False
+        # 메모리 DB는 마지막 연결이 닫히면 사라지므로 하나를 계속 열어 둠
+        self._keepalive = self._open() if self._uri else None
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self._target,
+            uri=self._uri,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if not self._uri:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _thread_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = _SQLiteConnection(self._open())
+            log.info("SQLite connection opened: %s", self.path)
+            try:
+                self._ensure_schema(conn)
+            except Exception:
+                # 스키마 준비에 실패한 연결은 스레드에 남기지 않음 (다음 요청이 다시 시도)
+                self._discard(conn.raw)
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _discard(self, raw):
+        with self._lock:
+            if raw in self._connections:
+                self._connections.remove(raw)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def _migration_lock(self):
+        """같은 DB 파일을 쓰는 워커(프로세스)끼리 스키마/마이그레이션을 하나씩 실행
+
+        마이그레이션은 중간에 커밋하므로 트랜잭션 잠금 대신 DB 옆 .lock 파일을 flock
+        """
+        if self._uri:
+            yield
+            return
+        with open(os.path.abspath(self.path) + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_schema(self, conn):
+        with self._lock, self._migration_lock():
+            if self._schema_ready:
+                return
+            cur = conn.cursor()
+            try:
+                for statement in SQLITE_SCHEMA:
+                    cur.execute(statement)
+                conn.commit()
+                cur.execute("SELECT version FROM schema_version")
+                applied = {row[0] for row in cur.fetchall()}
+                for version, description, step in SQLITE_MIGRATIONS:
+                    if version in applied:
+                        continue
+                    log.info("SQLite migration %s: %s", version, description)
+                    step(cur)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (version, description),
+                    )
+                    conn.commit()
+                self._schema_ready = True
+                log.info("SQLite schema ensured")
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.__exit__()
+
+    @contextmanager
+    def connection(self, read=False):
+        conn = self._thread_connection()
+        try:
+            with conn.cursor() as cur:
+                yield conn, cur
+        except sqlite3.Error:
+            metrics.inc('memo_db_query_errors_total', query=metrics.current_query.get())
+            raise
+        finally:
+            # 예외 종류와 상관없이 커밋하지 않은 트랜잭션 정리 (읽기만 한 경우 포함)
+            # 남겨 두면 스레드 연결이 쓰기 잠금을 쥐고 있어서 다른 스레드의 쓰기가 막힘
+            if conn.raw.in_transaction:
+                conn.rollback()
+
+    def reset(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            if conn is self._keepalive:
+                self._connections.append(conn)
+                continue
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    def stats(self):
+        with self._lock:
+            return {'idle': 0, 'in_use': len(self._connections)}